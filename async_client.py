@@ -0,0 +1,175 @@
+# encoding:utf-8
+import os
+import json
+import logging
+import asyncio
+import threading
+import concurrent.futures
+from typing import List
+
+from common.log import logger
+from .http_session import DOWNLOAD_CHUNK_SIZE
+
+# aiohttp为可选依赖，仅在开启suno_async_engine时需要
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+# 基于asyncio的Suno-API客户端：所有请求在同一个事件循环线程中以协程方式执行，
+# 同步代码通过submit/call把协程交给事件循环，并以线程安全的方式取回结果；
+# 创作等单个请求仍由调用线程阻塞等待，只替换了传输层，轮询时各Suno-API的批量查询由get_feeds并发执行
+class AsyncSunoClient:
+    def __init__(self, connect_timeout=5, read_timeout=30, pool_size=10, keep_alive=True, call_timeout=300):
+        if aiohttp is None:
+            raise ImportError("aiohttp is required by suno_async_engine, please run `pip install aiohttp`")
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.pool_size = pool_size
+        self.keep_alive = keep_alive
+        self.call_timeout = call_timeout
+        self.loop = asyncio.new_event_loop()
+        self._session = None
+        self._thread = threading.Thread(target=self._run, name="nicesuno-async-client", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    # 把协程交给事件循环执行，返回concurrent.futures.Future
+    def submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    # 把协程交给事件循环执行，并阻塞等待结果；超过timeout秒（默认call_timeout）时取消协程并抛出TimeoutError
+    def call(self, coro, timeout=None):
+        timeout = self.call_timeout if timeout is None else timeout
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise TimeoutError(f"[Nicesuno] async call timed out, timeout={timeout}")
+
+    # 关闭会话并停止事件循环
+    def close(self):
+        async def _close():
+            if self._session:
+                await self._session.close()
+        self.call(_close())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            timeout = aiohttp.ClientTimeout(sock_connect=self.connect_timeout, sock_read=self.read_timeout)
+            # 每个Suno-API最多pool_size个连接，关闭keep_alive时每次请求后关闭连接
+            connector = aiohttp.TCPConnector(limit=0, limit_per_host=self.pool_size, force_close=not self.keep_alive)
+            self._session = aiohttp.ClientSession(timeout=timeout, connector=connector)
+        return self._session
+
+    async def _request_json(self, name, method, url, payload=None, retry_count=0):
+        while retry_count >= 0:
+            try:
+                data = json.dumps(payload) if payload is not None else None
+                async with self._get_session().request(method, url, data=data) as response:
+                    text = await response.text()
+                    if response.status != 200:
+                        raise Exception(f"status_code is not ok, status_code={response.status}")
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug(f"[Nicesuno] {name}, response={text}")
+                    return json.loads(text)
+            except Exception as e:
+                logger.error(f"[Nicesuno] {name} failed, url={url}, error={e}")
+                retry_count -= 1
+                if retry_count >= 0:
+                    await asyncio.sleep(5)
+
+    # 创作音乐
+    async def generate_music_with_description(self, suno_api_base, description, make_instrumental=False, retry_count=0):
+        payload = {
+            "gpt_description_prompt": description,
+            "make_instrumental": make_instrumental,
+            "mv": "chirp-v3-0",
+        }
+        return await self._request_json("generate_music_with_description", "POST",
+                                        f"{suno_api_base}/generate/description-mode", payload, retry_count)
+
+    # 创作音乐
+    async def generate_music_custom_mode(self, suno_api_base, title=None, tags=None, lyrics=None, make_instrumental=False, retry_count=0):
+        payload = {
+            "title": title,
+            "tags": tags,
+            "prompt": lyrics,
+            "make_instrumental": make_instrumental,
+            "mv": "chirp-v3-0",
+            "continue_clip_id": None,
+            "continue_at": None,
+        }
+        return await self._request_json("generate_music_custom_mode", "POST",
+                                        f"{suno_api_base}/generate", payload, retry_count)
+
+    # 批量获取音乐信息
+    async def get_feed(self, suno_api_base, aids: List, retry_count=0):
+        return await self._request_json("get_feed", "GET", f"{suno_api_base}/feed/{','.join(aids)}", retry_count=retry_count)
+
+    # 并发获取多个Suno-API的音乐信息，requests为[(suno_api_base, aids)]，按顺序返回各自的结果，失败时为None
+    async def get_feeds(self, requests: List, retry_count=0):
+        results = await asyncio.gather(*[self.get_feed(suno_api_base, aids, retry_count) for suno_api_base, aids in requests],
+                                       return_exceptions=True)
+        return [None if isinstance(result, BaseException) else result for result in results]
+
+    # 创作歌词
+    async def generate_lyrics(self, suno_api_base, suno_lyric_prompt, retry_count=3):
+        payload = {
+            "prompt": suno_lyric_prompt
+        }
+        return await self._request_json("generate_lyrics", "POST", f"{suno_api_base}/generate/lyrics/", payload, retry_count)
+
+    # 获取歌词信息
+    async def get_lyrics(self, suno_api_base, lid, retry_count=3):
+        return await self._request_json("get_lyrics", "GET", f"{suno_api_base}/lyrics/{lid}", retry_count=retry_count)
+
+    # 下载文件：先写入临时文件，完成后原子重命名为目标文件；重试时通过Range请求续传已下载的部分
+    # 文件读写在默认线程池中执行，不阻塞事件循环
+    async def download_file(self, file_url, file_path, retry_count=3):
+        loop = asyncio.get_running_loop()
+        temp_path = f"{file_path}.part"
+        while retry_count >= 0:
+            try:
+                downloaded = await loop.run_in_executor(None, _file_size, temp_path)
+                headers = {"Range": f"bytes={downloaded}-"} if downloaded else {}
+                async with self._get_session().get(file_url, headers=headers, allow_redirects=True) as response:
+                    # 206表示服务端支持续传，200表示需要从头下载
+                    if response.status == 206:
+                        mode = "ab"
+                    elif response.status == 200:
+                        mode = "wb"
+                    else:
+                        if response.status == 416:
+                            await loop.run_in_executor(None, _remove_file, temp_path)
+                        raise Exception(f"[Nicesuno] 文件下载失败，file_url={file_url}, status_code={response.status}")
+                    f = await loop.run_in_executor(None, open, temp_path, mode)
+                    try:
+                        async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                            await loop.run_in_executor(None, f.write, chunk)
+                    finally:
+                        await loop.run_in_executor(None, f.close)
+                await loop.run_in_executor(None, os.replace, temp_path, file_path)
+                return
+            except Exception as e:
+                logger.error(f"[Nicesuno] 文件下载失败，file_url={file_url}, error={e}")
+                retry_count -= 1
+                if retry_count >= 0:
+                    await asyncio.sleep(5)
+        await loop.run_in_executor(None, _remove_file, temp_path)
+        raise Exception(f"[Nicesuno] 文件下载失败，已达到最大重试次数，file_url={file_url}")
+
+
+def _file_size(path):
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+def _remove_file(path):
+    if os.path.exists(path):
+        os.remove(path)
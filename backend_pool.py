@@ -0,0 +1,133 @@
+# encoding:utf-8
+import time
+import threading
+from typing import List
+
+from common.log import logger
+
+# 遇到以下错误时暂时下线对应的Suno-API，值为默认的下线时长（秒）
+DEFAULT_COOLDOWN_SECONDS = {
+    "Insufficient credits.": 3600,
+    "Unauthorized": 3600,
+    "Too many running jobs.": 60,
+}
+
+
+# 单个Suno-API后端，对应一个Suno账号
+class SunoBackend:
+    def __init__(self, base):
+        self.base = base
+        self.cooldown_until = 0
+        self.cooldown_reason = None
+        self.in_flight = 0
+
+    # usable_reasons中的下线原因不影响本次使用，例如额度用完后仍可创作歌词
+    def is_available(self, now=None, usable_reasons=()):
+        return (now or time.time()) >= self.cooldown_until or self.cooldown_reason in usable_reasons
+
+    def __repr__(self):
+        return f"SunoBackend(base={self.base})"
+
+
+# Suno-API后端池：轮询分配创作任务，限制每个后端同时进行的任务数，并在限额、失效或繁忙时暂时下线后端
+class BackendPool:
+    def __init__(self, bases: List, cooldown_seconds=None, max_in_flight=0):
+        self.backends = [SunoBackend(base) for base in bases]
+        self.cooldown_seconds = dict(DEFAULT_COOLDOWN_SECONDS)
+        if cooldown_seconds:
+            self.cooldown_seconds.update(cooldown_seconds)
+        # 每个后端同时进行的任务数上限，0表示不限制
+        self.max_in_flight = max_in_flight
+        self._next_index = 0
+        self._cond = threading.Condition()
+
+    # 根据地址获取后端
+    def get(self, base):
+        for backend in self.backends:
+            if backend.base == base:
+                return backend
+        return None
+
+    # 按轮询顺序占用一个可用且有空闲名额的后端，exclude中的后端不参与分配
+    # 所有后端都下线时立即返回None；仅因名额已满时最多等待timeout秒；ignore_limit为True时不受名额上限限制
+    def acquire(self, exclude=(), timeout=0, usable_reasons=(), ignore_limit=False):
+        deadline = time.time() + timeout
+        with self._cond:
+            while True:
+                now = time.time()
+                count = len(self.backends)
+                available = [self.backends[(self._next_index + i) % count] for i in range(count)]
+                available = [b for b in available if b not in exclude and b.is_available(now, usable_reasons)]
+                for backend in available:
+                    if ignore_limit or self._has_slot(backend):
+                        backend.in_flight += 1
+                        self._next_index = (self.backends.index(backend) + 1) % count
+                        return backend
+                if not available or now >= deadline:
+                    return None
+                # 后端下线结束时不会通知，因此定期醒来重新检查
+                self._cond.wait(min(deadline - now, 5))
+
+    # 占用指定后端的名额（不受上限限制），用于恢复插件重启前未完成的任务
+    def occupy(self, base):
+        with self._cond:
+            backend = self.get(base)
+            if backend:
+                backend.in_flight += 1
+
+    # 任务结束（或未能创建）后释放名额
+    def release(self, base):
+        with self._cond:
+            backend = self.get(base)
+            if backend and backend.in_flight > 0:
+                backend.in_flight -= 1
+                self._cond.notify()
+
+    # 当前空闲名额数，不限制名额时视为足够多
+    def free_slots(self):
+        now = time.time()
+        with self._cond:
+            available = [backend for backend in self.backends if backend.is_available(now)]
+            if not self.max_in_flight:
+                return len(available) * 1000
+            return sum(max(self.max_in_flight - backend.in_flight, 0) for backend in available)
+
+    # 是否有未下线的后端，全部下线时无需排队等待
+    def has_available(self):
+        now = time.time()
+        return any(backend.is_available(now) for backend in self.backends)
+
+    # 当前可同时进行的任务总数，用于估算排队时间
+    def capacity(self):
+        now = time.time()
+        available = [backend for backend in self.backends if backend.is_available(now)]
+        if not self.max_in_flight:
+            return max(len(available), 1)
+        return max(len(available) * self.max_in_flight, 1)
+
+    def _has_slot(self, backend: SunoBackend):
+        return not self.max_in_flight or backend.in_flight < self.max_in_flight
+
+    # 判断错误信息是否需要下线后端
+    def should_cooldown(self, detail):
+        return detail in self.cooldown_seconds
+
+    # 暂时下线后端
+    def cooldown(self, backend: SunoBackend, detail):
+        seconds = self.cooldown_seconds.get(detail, 0)
+        with self._cond:
+            backend.cooldown_until = max(backend.cooldown_until, time.time() + seconds)
+            backend.cooldown_reason = detail
+        logger.warning(f"[Nicesuno] suno_api_base={backend.base} cooled down for {seconds}s, detail={detail}")
+
+    # 没有可分配的后端时，返回对应的错误信息，以便沿用原有的错误提示：
+    # 有后端仅因名额已满而不可分配时视为繁忙，否则返回最早恢复的后端的下线原因
+    def unavailable_data(self, usable_reasons=()):
+        now = time.time()
+        if any(backend.is_available(now, usable_reasons) for backend in self.backends):
+            return {"detail": "Too many running jobs."}
+        cooling = [backend for backend in self.backends if backend.cooldown_reason]
+        if not cooling:
+            return None
+        backend = min(cooling, key=lambda b: b.cooldown_until)
+        return {"detail": backend.cooldown_reason}
@@ -0,0 +1,213 @@
+# encoding:utf-8
+# 本地模拟的Suno-API，用于压测插件，不消耗Suno额度
+# 单独运行：python fake_suno_server.py --port 3000 --audio-seconds 30 --error-rate 0.05 --credits 100
+import json
+import time
+import uuid
+import random
+import argparse
+import threading
+from collections import Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+# 模拟的Suno-API服务：音乐提交后依次经历submitted、streaming、complete状态，封面和视频分别在指定时间后就绪；
+# 可以按比例注入错误（HTTP 500或Suno-API的detail），并限制可用额度
+class FakeSunoServer:
+    def __init__(self, host="127.0.0.1", port=0, stream_seconds=10, audio_seconds=30, image_seconds=35,
+                 video_seconds=60, lyrics_seconds=3, audio_bytes=1024 * 1024, error_rate=0.0, credits=None):
+        self.stream_seconds = stream_seconds
+        self.audio_seconds = audio_seconds
+        self.image_seconds = image_seconds
+        self.video_seconds = video_seconds
+        self.lyrics_seconds = lyrics_seconds
+        self.audio_bytes = audio_bytes
+        self.error_rate = error_rate
+        self.credits = credits
+        # 各接口的请求数
+        self.requests = Counter()
+        self._clips = {}
+        self._lyrics = {}
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._create_handler())
+        self.server.daemon_threads = True
+        self.base = f"http://{host}:{self.server.server_address[1]}"
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name="fake-suno-api", daemon=True)
+        self._thread.start()
+        return self.base
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    # 提交创作任务，返回的错误响应与Suno-API保持一致
+    def generate(self, payload, endpoint):
+        with self._lock:
+            self.requests[endpoint] += 1
+            if random.random() < self.error_rate:
+                return 200, {"detail": random.choice(["Too many running jobs.", "Topic too long."])}
+            if self.credits is not None:
+                if self.credits <= 0:
+                    return 200, {"detail": "Insufficient credits."}
+                self.credits -= 1
+            now = time.time()
+            prompt = payload.get("prompt") or f"[Verse]\n{payload.get('gpt_description_prompt', '')}"
+            clips = []
+            for _ in range(2):
+                aid = uuid.uuid4().hex
+                self._clips[aid] = {
+                    "created_at": now,
+                    "title": payload.get("title") or "Fake Song",
+                    "prompt": prompt,
+                    "tags": payload.get("tags") or "pop",
+                    "gpt_description_prompt": payload.get("gpt_description_prompt"),
+                }
+                clips.append({"id": aid, "status": "submitted"})
+            return 200, {"id": uuid.uuid4().hex, "clips": clips}
+
+    def generate_lyrics(self, payload):
+        with self._lock:
+            self.requests["generate_lyrics"] += 1
+            lid = uuid.uuid4().hex
+            self._lyrics[lid] = {"created_at": time.time(), "prompt": payload.get("prompt", "")}
+            return 200, {"id": lid}
+
+    def feed(self, aids):
+        with self._lock:
+            self.requests["feed"] += 1
+            if random.random() < self.error_rate:
+                return 500, {"detail": "Internal Server Error"}
+            now = time.time()
+            result = []
+            for aid in aids:
+                clip = self._clips.get(aid)
+                if not clip:
+                    continue
+                elapsed = now - clip["created_at"]
+                if elapsed >= self.audio_seconds:
+                    status, audio_url = "complete", f"{self.base}/cdn/{aid}.mp3"
+                elif elapsed >= self.stream_seconds:
+                    status, audio_url = "streaming", f"{self.base}/cdn/{aid}.mp3"
+                else:
+                    status, audio_url = "submitted", ""
+                result.append({
+                    "id": aid,
+                    "title": clip["title"],
+                    "status": status,
+                    "audio_url": audio_url,
+                    "image_url": f"{self.base}/cdn/{aid}.jpeg" if elapsed >= self.image_seconds else "",
+                    "video_url": f"{self.base}/cdn/{aid}.mp4" if elapsed >= self.video_seconds else "",
+                    "metadata": {
+                        "prompt": clip["prompt"],
+                        "tags": clip["tags"],
+                        "gpt_description_prompt": clip["gpt_description_prompt"],
+                    },
+                })
+            return 200, result
+
+    def lyrics(self, lid):
+        with self._lock:
+            self.requests["lyrics"] += 1
+            data = self._lyrics.get(lid)
+            if not data:
+                return 404, {"detail": "Not Found"}
+            complete = time.time() - data["created_at"] >= self.lyrics_seconds
+            return 200, {
+                "status": "complete" if complete else "running",
+                "title": "Fake Lyrics",
+                "text": f"[Verse]\n{data['prompt']}" if complete else "",
+            }
+
+    def _create_handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                try:
+                    payload = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError:
+                    payload = {}
+                path = self.path.rstrip("/")
+                if path == "/generate/lyrics":
+                    self._send_json(*fake.generate_lyrics(payload))
+                elif path == "/generate/description-mode":
+                    self._send_json(*fake.generate(payload, "generate_description_mode"))
+                elif path == "/generate":
+                    self._send_json(*fake.generate(payload, "generate"))
+                else:
+                    self._send_json(404, {"detail": "Not Found"})
+
+            def do_GET(self):
+                path = self.path.split("?")[0]
+                if path.startswith("/feed/"):
+                    self._send_json(*fake.feed([aid for aid in path[len("/feed/"):].split(",") if aid]))
+                elif path.startswith("/lyrics/"):
+                    self._send_json(*fake.lyrics(path[len("/lyrics/"):]))
+                elif path.startswith("/cdn/"):
+                    with fake._lock:
+                        fake.requests["cdn"] += 1
+                    self._send_file()
+                else:
+                    self._send_json(404, {"detail": "Not Found"})
+
+            def _send_json(self, status, data):
+                body = json.dumps(data).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            # 支持Range请求，便于测试断点续传
+            def _send_file(self):
+                start = 0
+                range_header = self.headers.get("Range")
+                if range_header and range_header.startswith("bytes="):
+                    start = int(range_header[len("bytes="):].split("-")[0] or 0)
+                if start >= fake.audio_bytes:
+                    self.send_response(416)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                length = fake.audio_bytes - start
+                self.send_response(206 if start else 200)
+                self.send_header("Content-Type", "application/octet-stream")
+                self.send_header("Content-Length", str(length))
+                self.end_headers()
+                chunk = b"\0" * 65536
+                while length > 0:
+                    self.wfile.write(chunk[:min(length, len(chunk))])
+                    length -= len(chunk)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="本地模拟的Suno-API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3000)
+    parser.add_argument("--stream-seconds", type=float, default=10, help="提交后多久开始流式生成")
+    parser.add_argument("--audio-seconds", type=float, default=30, help="提交后多久音乐生成完成")
+    parser.add_argument("--image-seconds", type=float, default=35, help="提交后多久封面就绪")
+    parser.add_argument("--video-seconds", type=float, default=60, help="提交后多久视频就绪")
+    parser.add_argument("--lyrics-seconds", type=float, default=3, help="提交后多久歌词创作完成")
+    parser.add_argument("--audio-bytes", type=int, default=1024 * 1024, help="音乐文件大小")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="创作和查询接口返回错误的比例")
+    parser.add_argument("--credits", type=int, default=None, help="可用额度，不指定时不限制")
+    args = parser.parse_args()
+    fake_server = FakeSunoServer(args.host, args.port, args.stream_seconds, args.audio_seconds, args.image_seconds,
+                                 args.video_seconds, args.lyrics_seconds, args.audio_bytes, args.error_rate, args.credits)
+    print(f"fake Suno-API listening on {fake_server.base}")
+    try:
+        fake_server.server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"requests: {dict(fake_server.requests)}")
@@ -0,0 +1,334 @@
+# encoding:utf-8
+# 插件压测：启动本地模拟的Suno-API，以多个并发的模拟用户调用on_handle_context，统计端到端延迟、上游请求数、峰值线程数和内存
+# 需要在chatgpt-on-wechat的目录中运行，例如：
+#   python plugins/nicesuno/benchmark/load_test.py --users 20 --requests 3 --time-scale 0.1
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import tempfile
+import threading
+import importlib
+from collections import Counter
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+PLUGIN_DIR = os.path.dirname(BENCHMARK_DIR)
+# 在chatgpt-on-wechat的目录中运行，插件目录可能是软链接，按实际路径查找插件的包名
+COW_DIR = os.getcwd()
+PLUGIN_PACKAGE = "plugins." + next((name for name in os.listdir(os.path.join(COW_DIR, "plugins"))
+                                    if os.path.realpath(os.path.join(COW_DIR, "plugins", name)) == os.path.realpath(PLUGIN_DIR)),
+                                   os.path.basename(PLUGIN_DIR))
+sys.path.insert(0, COW_DIR)
+sys.path.insert(0, BENCHMARK_DIR)
+
+from fake_suno_server import FakeSunoServer
+
+# 回复文本中表示创作失败的关键词
+FAILURE_MARKERS = ("失败", "抱歉", "太频繁", "已满", "一天只能", "劝退", "打回", "太忙", "仅管理员")
+
+
+# 一次模拟请求的各阶段时间点
+class RequestRecord:
+    def __init__(self, request_id, user, mode):
+        self.request_id = request_id
+        self.user = user
+        self.mode = mode
+        self.started_at = None
+        self.ack_at = None
+        self.stream_at = None
+        self.first_audio_at = None
+        self.done_at = None
+        self.failure = None
+        self.replies = Counter()
+
+    def finished(self):
+        return self.done_at is not None or self.failure is not None
+
+
+# 记录所有请求收到的回复
+class Recorder:
+    def __init__(self):
+        self.records = {}
+        self._lock = threading.Lock()
+
+    def add(self, record: RequestRecord):
+        with self._lock:
+            self.records[record.request_id] = record
+
+    def on_reply(self, request_id, reply):
+        now = time.time()
+        with self._lock:
+            record = self.records.get(request_id)
+            if not record or reply is None:
+                return
+            record.replies[reply.type.name] += 1
+            content = str(reply.content)
+            if reply.type.name == "FILE":
+                record.first_audio_at = record.first_audio_at or now
+            elif reply.type.name != "TEXT":
+                return
+            elif "请查收" in content:
+                record.done_at = now
+            elif content.startswith("🎧"):
+                record.stream_at = record.stream_at or now
+            elif content.startswith("🎻") and record.mode == "lyrics":
+                record.done_at = now
+            elif any(marker in content for marker in FAILURE_MARKERS):
+                record.failure = record.failure or content.split("\n")[0][:30]
+            elif record.ack_at is None:
+                record.ack_at = now
+
+    def all_finished(self):
+        with self._lock:
+            return all(record.finished() for record in self.records.values())
+
+
+# 模拟的消息通道，插件通过send发送的回复交给Recorder
+class FakeChannel:
+    def __init__(self, recorder: Recorder):
+        self.recorder = recorder
+
+    def send(self, reply, context):
+        self.recorder.on_reply(context["request_id"], reply)
+
+
+# 模拟的消息，属性与chatgpt-on-wechat的ChatMessage一致
+class FakeMessage:
+    def __init__(self, user, group=None):
+        self.msg_id = f"{user}-{time.time()}"
+        self.from_user_id = group or user
+        self.from_user_nickname = group or user
+        self.to_user_id = "bot"
+        self.to_user_nickname = "bot"
+        self.other_user_id = group or user
+        self.other_user_nickname = group or user
+        self.actual_user_id = user
+        self.actual_user_nickname = user
+        self.is_group = group is not None
+
+
+# 定期采样线程数和内存
+class ResourceSampler:
+    def __init__(self, interval=0.2):
+        self.interval = interval
+        self.peak_threads = threading.active_count()
+        self.peak_rss_bytes = current_rss_bytes()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="benchmark-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.peak_threads = max(self.peak_threads, threading.active_count())
+            self.peak_rss_bytes = max(self.peak_rss_bytes, current_rss_bytes())
+
+
+# 当前进程的常驻内存，仅支持Linux，其他平台返回0
+def current_rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except Exception:
+        return 0
+
+
+# 最近秩法计算分位数
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, int(round(q * len(values) + 0.5)) - 1))]
+
+
+# 按time_scale缩放插件的默认轮询窗口和音乐的超时时间，使压测在较短时间内完成
+def scale_plugin_timings(time_scale):
+    polling_policy = importlib.import_module(f"{PLUGIN_PACKAGE}.polling_policy")
+    feed_poller = importlib.import_module(f"{PLUGIN_PACKAGE}.feed_poller")
+    for kind, (start, end) in polling_policy.DEFAULT_READY_WINDOWS.items():
+        polling_policy.DEFAULT_READY_WINDOWS[kind] = (start * time_scale, end * time_scale)
+    for field, timeout in feed_poller.DEFAULT_CLIP_TIMEOUTS.items():
+        feed_poller.DEFAULT_CLIP_TIMEOUTS[field] = timeout * time_scale
+
+
+# 使用配置模板和压测参数创建插件
+def create_plugin(args, suno_api_bases, output_dir):
+    plugins = importlib.import_module("plugins")
+    module = importlib.import_module(f"{PLUGIN_PACKAGE}.nicesuno")
+    with open(os.path.join(PLUGIN_DIR, "config.json.template"), "r", encoding="utf-8") as f:
+        conf = json.load(f)
+    conf.update({
+        "suno_api_bases": suno_api_bases,
+        "music_output_dir": output_dir,
+        "is_journal_jobs": False,
+        "result_cache_path": "",
+        "metrics_port": 0,
+        "polling_policy": {
+            "min_interval": max(2 * args.time_scale, 0.1),
+            "max_interval": max(20 * args.time_scale, 0.5),
+        },
+    })
+    for item in args.config:
+        key, value = item.split("=", 1)
+        conf[key] = json.loads(value)
+    # 插件通过Plugin.load_config读取配置，压测时直接返回上面的配置
+    load_config = plugins.Plugin.load_config
+    plugins.Plugin.load_config = lambda self: conf
+    try:
+        return module.Nicesuno()
+    finally:
+        plugins.Plugin.load_config = load_config
+
+
+# 一个模拟用户依次发送requests个请求
+def run_user(plugin, recorder, channel, args, user, group, request_ids):
+    plugins = importlib.import_module("plugins")
+    context_module = importlib.import_module("bridge.context")
+    prefixes = {
+        "music": plugin.music_create_prefixes,
+        "instrumental": plugin.instrumental_create_prefixes,
+        "lyrics": plugin.lyrics_create_prefixes,
+    }
+    for request_id in request_ids:
+        mode = args.mode
+        # 重复的提示词用于测试创作结果缓存
+        topic = "重复的测试歌曲" if random.random() < args.repeat_ratio else f"第{request_id}首测试歌曲"
+        content = f"{prefixes[mode][0]} {topic}"
+        kwargs = {
+            "isgroup": group is not None,
+            "msg": FakeMessage(user, group),
+            "receiver": group or user,
+            "session_id": group or user,
+            "request_id": request_id,
+        }
+        context = context_module.Context(context_module.ContextType.TEXT, content, kwargs)
+        e_context = plugins.EventContext(plugins.Event.ON_HANDLE_CONTEXT, {"context": context, "channel": channel})
+        record = RequestRecord(request_id, user, mode)
+        recorder.add(record)
+        record.started_at = time.time()
+        plugin.on_handle_context(e_context)
+        recorder.on_reply(request_id, e_context.econtext.get("reply"))
+        time.sleep(args.think_seconds * random.uniform(0.5, 1.5))
+
+
+def format_seconds(value):
+    return "-" if value is None else f"{value:.2f}s"
+
+
+def build_report(recorder, fake_servers, sampler, plugin, elapsed):
+    records = list(recorder.records.values())
+    stages = {
+        "ack": [r.ack_at - r.started_at for r in records if r.ack_at],
+        "stream_link": [r.stream_at - r.started_at for r in records if r.stream_at],
+        "first_audio": [r.first_audio_at - r.started_at for r in records if r.first_audio_at],
+        "complete": [r.done_at - r.started_at for r in records if r.done_at],
+    }
+    done = len(stages["complete"])
+    return {
+        "requests": len(records),
+        "completed": done,
+        "failed": Counter(r.failure for r in records if r.failure),
+        "unfinished": sum(1 for r in records if not r.finished()),
+        "elapsed_seconds": round(elapsed, 2),
+        "throughput_per_minute": round(done / elapsed * 60, 2) if elapsed else 0,
+        "latency": {
+            stage: {
+                "p50": percentile(values, 0.5),
+                "p90": percentile(values, 0.9),
+                "p99": percentile(values, 0.99),
+                "max": max(values) if values else None,
+            } for stage, values in stages.items()
+        },
+        "upstream_requests": dict(sum((fake_server.requests for fake_server in fake_servers), Counter())),
+        "http_connections": plugin.http_sessions.stats(),
+        "peak_threads": sampler.peak_threads,
+        "peak_rss_mb": round(sampler.peak_rss_bytes / 1024 / 1024, 1),
+    }
+
+
+def print_report(report, plugin):
+    print(f"\n===== Nicesuno load test =====")
+    print(f"requests={report['requests']}, completed={report['completed']}, unfinished={report['unfinished']}, "
+          f"elapsed={report['elapsed_seconds']}s, throughput={report['throughput_per_minute']}/min")
+    for reason, count in report["failed"].items():
+        print(f"failed: {reason} x{count}")
+    print(f"{'stage':<14}{'p50':>10}{'p90':>10}{'p99':>10}{'max':>10}")
+    for stage, values in report["latency"].items():
+        print(f"{stage:<14}" + "".join(f"{format_seconds(values[key]):>10}" for key in ("p50", "p90", "p99", "max")))
+    print(f"upstream requests: {report['upstream_requests']}")
+    print(f"http connections: {report['http_connections']}")
+    print(f"peak threads={report['peak_threads']}, peak rss={report['peak_rss_mb']}MB")
+    print(f"\n----- plugin metrics -----\n{plugin.metrics.summary()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Nicesuno插件压测")
+    parser.add_argument("--users", type=int, default=10, help="并发的模拟用户数")
+    parser.add_argument("--requests", type=int, default=2, help="每个用户发送的请求数")
+    parser.add_argument("--groups", type=int, default=0, help="用户分布的群数，为0时全部为私聊")
+    parser.add_argument("--mode", choices=("music", "instrumental", "lyrics"), default="music")
+    parser.add_argument("--think-seconds", type=float, default=1, help="同一用户两次请求之间的平均间隔")
+    parser.add_argument("--repeat-ratio", type=float, default=0, help="使用相同提示词的请求比例")
+    parser.add_argument("--backends", type=int, default=1, help="模拟的Suno-API数量，每个都是独立的模拟服务")
+    parser.add_argument("--time-scale", type=float, default=1, help="缩放模拟服务的就绪时间和插件的轮询窗口，例如0.1表示快10倍")
+    parser.add_argument("--audio-bytes", type=int, default=1024 * 1024)
+    parser.add_argument("--error-rate", type=float, default=0)
+    parser.add_argument("--credits", type=int, default=None, help="每个模拟Suno-API的可用额度，不指定时不限制")
+    parser.add_argument("--config", action="append", default=[], help="覆盖插件配置，例如--config is_send_stream_url=true")
+    parser.add_argument("--timeout", type=float, default=900, help="等待所有请求完成的最长时间（秒）")
+    parser.add_argument("--json", help="把报告另存为JSON文件")
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+
+    logging.getLogger("log").setLevel(args.log_level)
+    scale = args.time_scale
+    # 每个Suno-API使用独立的模拟服务，地址各不相同，与生产环境中部署多套Suno-API一致
+    fake_servers = [FakeSunoServer(stream_seconds=10 * scale, audio_seconds=30 * scale, image_seconds=35 * scale,
+                                   video_seconds=60 * scale, lyrics_seconds=3 * scale, audio_bytes=args.audio_bytes,
+                                   error_rate=args.error_rate, credits=args.credits) for _ in range(max(args.backends, 1))]
+    suno_api_bases = [fake_server.start() for fake_server in fake_servers]
+    scale_plugin_timings(scale)
+    output_dir = tempfile.mkdtemp(prefix="nicesuno-benchmark-")
+    plugin = create_plugin(args, suno_api_bases, output_dir)
+
+    recorder = Recorder()
+    channel = FakeChannel(recorder)
+    sampler = ResourceSampler()
+    sampler.start()
+    started_at = time.time()
+    threads = []
+    for index in range(args.users):
+        user = f"user{index}"
+        group = f"group{index % args.groups}" if args.groups else None
+        request_ids = [f"{index}-{i}" for i in range(args.requests)]
+        thread = threading.Thread(target=run_user, args=(plugin, recorder, channel, args, user, group, request_ids),
+                                  name=f"benchmark-{user}")
+        threads.append(thread)
+        thread.start()
+    for thread in threads:
+        thread.join()
+    deadline = started_at + args.timeout
+    while not recorder.all_finished() and time.time() < deadline:
+        time.sleep(0.2)
+    elapsed = time.time() - started_at
+    sampler.stop()
+
+    report = build_report(recorder, fake_servers, sampler, plugin, elapsed)
+    print_report(report, plugin)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    for fake_server in fake_servers:
+        fake_server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# encoding:utf-8
+# 消息处理微基准：测量繁忙群聊中与创作无关的消息经过on_handle_context的平均耗时，以及前缀匹配本身的耗时
+# 需要在chatgpt-on-wechat的目录中运行，例如：
+#   python plugins/nicesuno/benchmark/message_bench.py --messages 200000
+import time
+import random
+import logging
+import argparse
+import tempfile
+import importlib
+from types import SimpleNamespace
+
+from load_test import FakeMessage, create_plugin
+
+# 模拟群聊中的普通消息
+CHAT_MESSAGES = [
+    "哈哈哈哈哈",
+    "今天中午吃什么？",
+    "@小助手 帮我翻译一下这句话：The quick brown fox jumps over the lazy dog.",
+    "这首歌真好听，谁能推荐几首类似的？",
+    "[图片]",
+    "收到",
+    "明天早上九点开会，记得带电脑" * 3,
+    "唉",
+]
+# chatgpt-on-wechat的日志记录器
+plugin_logger = logging.getLogger("log")
+
+
+# 原先的前缀判断方式，作为对比的基准：每条消息都格式化一次调试日志，并依次扫描三组前缀
+def legacy_match(plugin, content):
+    plugin_logger.debug(f"[Nicesuno] on_handle_context. content={content}")
+    for prefixes in (plugin.music_create_prefixes, plugin.instrumental_create_prefixes, plugin.lyrics_create_prefixes):
+        for prefix in prefixes:
+            if content.startswith(prefix):
+                return prefix, content[len(prefix):].strip()
+    plugin_logger.debug(f"[Nicesuno] content starts without any suno prefixes, ignored.")
+    return None, None
+
+
+def measure(func, items, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for item in items:
+            func(item)
+    return (time.perf_counter() - start) / (repeat * len(items)) * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Nicesuno消息处理微基准")
+    parser.add_argument("--messages", type=int, default=200000, help="测量的消息数")
+    args = parser.parse_args()
+
+    # 与生产环境一致，关闭调试日志
+    plugin_logger.setLevel(logging.INFO)
+    plugin_args = SimpleNamespace(time_scale=1, config=[])
+    plugin = create_plugin(plugin_args, ["http://127.0.0.1:9"], tempfile.mkdtemp(prefix="nicesuno-bench-"))
+    plugins = importlib.import_module("plugins")
+    context_module = importlib.import_module("bridge.context")
+
+    contents = [random.choice(CHAT_MESSAGES) for _ in range(1000)]
+    e_contexts = []
+    for content in contents:
+        kwargs = {"isgroup": True, "msg": FakeMessage("user", "group"), "receiver": "group", "session_id": "group"}
+        context = context_module.Context(context_module.ContextType.TEXT, content, kwargs)
+        e_contexts.append(plugins.EventContext(plugins.Event.ON_HANDLE_CONTEXT, {"context": context, "channel": None}))
+    repeat = max(1, args.messages // len(contents))
+
+    results = {
+        "on_handle_context (ignored message)": measure(plugin.on_handle_context, e_contexts, repeat),
+        "prefix match (ignored message)": measure(plugin._match_prefix, contents, repeat),
+        "legacy prefix scan (ignored message)": measure(lambda content: legacy_match(plugin, content), contents, repeat),
+    }
+    prompts = [f"{plugin.music_create_prefixes[0]} 第{i}首测试歌曲" for i in range(1000)]
+    results["prefix match (music prompt)"] = measure(plugin._match_prefix, prompts, repeat)
+    results["legacy prefix scan (music prompt)"] = measure(lambda content: legacy_match(plugin, content), prompts, repeat)
+
+    print(f"\n===== Nicesuno message microbenchmark, {repeat * len(contents)} messages =====")
+    for name, nanoseconds in results.items():
+        print(f"{name:<40}{nanoseconds:>10.0f} ns/msg")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+# encoding:utf-8
+import time
+import threading
+from typing import Callable, List
+
+from common.log import logger
+from .polling_policy import PollingPolicy
+
+# 音乐信息中需要等待的字段及默认的超时时间（秒，从开始轮询算起）
+DEFAULT_CLIP_TIMEOUTS = {
+    "stream_url": 150,
+    "audio_url": 195,
+    "image_url": 255,
+    "video_url": 375,
+}
+# 歌词的默认超时时间（秒）
+DEFAULT_LYRICS_TIMEOUT = 120
+# audio_url可以播放的状态：streaming时为边生成边播放的试听地址，complete时为完整的音乐
+PLAYABLE_STATUSES = ("streaming", "complete")
+# 音乐生成失败的状态，等待中的字段不会再就绪
+FAILED_STATUSES = ("error",)
+
+
+# 一首音乐的轮询任务
+class _ClipWatch:
+    def __init__(self, suno_api_base, aid, fields: List, callback: Callable, timeouts, next_poll_at):
+        now = time.time()
+        self.suno_api_base = suno_api_base
+        self.aid = aid
+        self.pending = list(fields)
+        self.callback = callback
+        self.started_at = now
+        self.deadlines = {field: now + timeouts.get(field, DEFAULT_CLIP_TIMEOUTS["video_url"]) for field in fields}
+        self.next_poll_at = next_poll_at
+        self.polls = 0
+
+
+# 一份歌词的轮询任务
+class _LyricsWatch:
+    def __init__(self, suno_api_base, lid, callback: Callable, timeout, next_poll_at):
+        self.suno_api_base = suno_api_base
+        self.lid = lid
+        self.callback = callback
+        self.started_at = time.time()
+        self.deadline = self.started_at + timeout
+        self.next_poll_at = next_poll_at
+
+
+# 统一轮询服务：由一个线程跟踪所有等待中的音乐和歌词，每轮对每个Suno-API只发送一次批量的/feed/请求，
+# 一次请求同时检查音乐、封面和视频是否就绪；轮询间隔由PollingPolicy根据历史就绪耗时决定
+# 回调在轮询线程中执行，耗时的操作（下载、发送）需要由回调自行转交给其他线程
+# 提供fetch_feeds时，同一轮中各Suno-API的批量请求一次性交给fetch_feeds并发执行
+class FeedPoller:
+    def __init__(self, fetch_feed: Callable, fetch_lyrics: Callable, policy: PollingPolicy = None, max_batch_size=20,
+                 stream_audio=False, metrics=None, fetch_feeds: Callable = None):
+        self.fetch_feed = fetch_feed
+        self.fetch_feeds = fetch_feeds
+        self.fetch_lyrics = fetch_lyrics
+        self.policy = policy or PollingPolicy()
+        self.max_batch_size = max_batch_size
+        self.stream_audio = stream_audio
+        self.metrics = metrics
+        self._clip_watches = {}
+        self._lyrics_watches = {}
+        self._cond = threading.Condition()
+        self._thread = None
+
+    # 等待音乐的fields字段出现，出现时调用callback(aid, field, clip)，超时调用callback(aid, field, None)
+    def watch_clip(self, suno_api_base, aid, fields: List, callback: Callable, timeouts=None):
+        watch = _ClipWatch(suno_api_base, aid, fields, callback, timeouts or DEFAULT_CLIP_TIMEOUTS,
+                           time.time() + self.policy.next_delay(fields, 0))
+        with self._cond:
+            self._clip_watches[aid] = watch
+            self._ensure_started()
+            self._cond.notify()
+
+    # 停止等待某首音乐的所有字段
+    def unwatch_clip(self, aid):
+        with self._cond:
+            self._clip_watches.pop(aid, None)
+
+    # 等待歌词创作完成，完成时调用callback(lid, data)，超时调用callback(lid, None)
+    def watch_lyrics(self, suno_api_base, lid, callback: Callable, timeout=DEFAULT_LYRICS_TIMEOUT):
+        watch = _LyricsWatch(suno_api_base, lid, callback, timeout, time.time() + self.policy.next_delay(["lyrics"], 0))
+        with self._cond:
+            self._lyrics_watches[lid] = watch
+            self._ensure_started()
+            self._cond.notify()
+
+    def pending_count(self):
+        with self._cond:
+            return len(self._clip_watches) + len(self._lyrics_watches)
+
+    def _ensure_started(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="nicesuno-feed-poller", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                due_clips, due_lyrics = self._wait_for_due()
+                batches = []
+                for suno_api_base, watches in due_clips.items():
+                    for i in range(0, len(watches), self.max_batch_size):
+                        batches.append((suno_api_base, watches[i:i + self.max_batch_size]))
+                if self.fetch_feeds and len(batches) > 1:
+                    results = self.fetch_feeds([(suno_api_base, [watch.aid for watch in watches]) for suno_api_base, watches in batches])
+                    for (suno_api_base, watches), clips in zip(batches, results):
+                        self._apply_feed(suno_api_base, watches, clips)
+                else:
+                    for suno_api_base, watches in batches:
+                        self._poll_clips(suno_api_base, watches)
+                for watch in due_lyrics:
+                    self._poll_lyrics(watch)
+            except Exception as e:
+                logger.error(f"[Nicesuno] feed poller error, error={e}")
+                time.sleep(self.policy.min_interval)
+
+    # 阻塞直到有需要轮询的任务，返回按Suno-API分组的音乐任务和歌词任务
+    # 同一Suno-API上即将到期的音乐任务一并返回，以便合并到同一次批量请求中
+    def _wait_for_due(self):
+        with self._cond:
+            while True:
+                watches = list(self._clip_watches.values()) + list(self._lyrics_watches.values())
+                if not watches:
+                    self._cond.wait()
+                    continue
+                now = time.time()
+                next_poll_at = min(watch.next_poll_at for watch in watches)
+                if next_poll_at > now:
+                    self._cond.wait(next_poll_at - now)
+                    continue
+                due_clips = {}
+                for watch in self._clip_watches.values():
+                    if watch.next_poll_at <= now:
+                        due_clips.setdefault(watch.suno_api_base, [])
+                for watch in self._clip_watches.values():
+                    if watch.suno_api_base in due_clips and watch.next_poll_at <= now + self.policy.min_interval:
+                        due_clips[watch.suno_api_base].append(watch)
+                due_lyrics = [watch for watch in self._lyrics_watches.values() if watch.next_poll_at <= now]
+                return due_clips, due_lyrics
+
+    def _poll_clips(self, suno_api_base, watches: List[_ClipWatch]):
+        self._apply_feed(suno_api_base, watches, self.fetch_feed(suno_api_base, [watch.aid for watch in watches]))
+
+    # 根据一次批量请求的结果更新各音乐的轮询任务，clips为None表示请求失败
+    def _apply_feed(self, suno_api_base, watches: List[_ClipWatch], clips):
+        if self.metrics:
+            self.metrics.inc("feed_requests_total", backend=suno_api_base)
+        if clips is None:
+            logger.warning(f"[Nicesuno] 获取音乐信息失败，稍后重试！suno_api_base={suno_api_base}")
+            if self.metrics:
+                self.metrics.inc("feed_errors_total", backend=suno_api_base)
+        clip_map = {clip.get("id"): clip for clip in clips or [] if isinstance(clip, dict)}
+        now = time.time()
+        for watch in watches:
+            clip = clip_map.get(watch.aid)
+            watch.polls += 1
+            failed = clip is not None and clip.get("status") in FAILED_STATUSES
+            if failed:
+                logger.warning(f"[Nicesuno] 音乐生成失败，aid={watch.aid}, status={clip.get('status')}, pending={watch.pending}")
+            for field in list(watch.pending):
+                if clip and not failed and self._is_ready(clip, field):
+                    watch.pending.remove(field)
+                    self.policy.record(field, now - watch.started_at)
+                    self._notify(watch.callback, watch.aid, field, clip)
+                elif failed or now >= watch.deadlines[field]:
+                    watch.pending.remove(field)
+                    self._notify(watch.callback, watch.aid, field, None)
+            with self._cond:
+                if not watch.pending:
+                    if self._clip_watches.get(watch.aid) is watch:
+                        del self._clip_watches[watch.aid]
+                    if self.metrics:
+                        self.metrics.observe("clip_polls", watch.polls)
+                else:
+                    watch.next_poll_at = now + self.policy.next_delay(watch.pending, now - watch.started_at)
+
+    # stream_url在音乐开始流式生成时就绪，此时audio_url为试听地址；
+    # 开启stream_audio时，audio_url需等到音乐生成完成才就绪，其余字段不为空即就绪；生成失败的音乐由调用方处理
+    def _is_ready(self, clip, field):
+        if field == "stream_url":
+            return clip.get("audio_url") and clip.get("status") in PLAYABLE_STATUSES
+        if field == "audio_url" and self.stream_audio:
+            return clip.get("audio_url") and clip.get("status") == "complete"
+        return clip.get(field)
+
+    def _poll_lyrics(self, watch: _LyricsWatch):
+        data = self.fetch_lyrics(watch.suno_api_base, watch.lid, 0)
+        now = time.time()
+        if data and data.get("status") == "complete":
+            done = True
+            self.policy.record("lyrics", now - watch.started_at)
+            self._notify(watch.callback, watch.lid, data)
+        elif now >= watch.deadline:
+            done = True
+            self._notify(watch.callback, watch.lid, None)
+        else:
+            done = False
+        with self._cond:
+            if done:
+                if self._lyrics_watches.get(watch.lid) is watch:
+                    del self._lyrics_watches[watch.lid]
+            else:
+                watch.next_poll_at = now + self.policy.next_delay(["lyrics"], now - watch.started_at)
+
+    def _notify(self, callback: Callable, *args):
+        try:
+            callback(*args)
+        except Exception as e:
+            logger.error(f"[Nicesuno] feed poller callback failed, args={args[:2]}, error={e}")
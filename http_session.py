@@ -0,0 +1,62 @@
+# encoding:utf-8
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# 下载文件时每次读取的块大小
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+
+
+# 复用连接的HTTP会话池：每个Suno-API以及CDN下载各使用一个带连接池和重试策略的requests.Session
+class HttpSessionPool:
+    def __init__(self, pool_size=10, max_retries=2, backoff_factor=0.5, keep_alive=True):
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.keep_alive = keep_alive
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    # 获取key（Suno-API地址或cdn）对应的会话，不存在时创建
+    def get(self, key) -> requests.Session:
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                session = self._create_session()
+                self._sessions[key] = session
+            return session
+
+    def _create_session(self):
+        # 仅对GET请求按状态码重试，避免重复提交创作任务；连接失败时请求尚未发出，任何方法都可重试
+        retry = Retry(total=self.max_retries, read=0, backoff_factor=self.backoff_factor,
+                      status_forcelist=(502, 503, 504), allowed_methods=frozenset(["GET"]),
+                      raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size, max_retries=retry)
+        session = requests.Session()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        if not self.keep_alive:
+            session.headers["Connection"] = "close"
+        return session
+
+    # 各会话新建的连接数、发出的请求数和连接复用率
+    def stats(self):
+        with self._lock:
+            sessions = dict(self._sessions)
+        result = {}
+        for key, session in sessions.items():
+            connections, requests_count = 0, 0
+            # http和https共用同一个adapter，需去重
+            adapters = {id(adapter): adapter for adapter in session.adapters.values()}
+            for adapter in adapters.values():
+                pools = adapter.poolmanager.pools
+                for pool_key in pools.keys():
+                    pool = pools.get(pool_key)
+                    if pool:
+                        connections += pool.num_connections
+                        requests_count += pool.num_requests
+            reuse_rate = 1 - connections / requests_count if requests_count else 0
+            result[key] = {"connections": connections, "requests": requests_count, "reuse_rate": round(reuse_rate, 3)}
+        return result
@@ -0,0 +1,123 @@
+# encoding:utf-8
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from typing import List
+
+from common.log import logger
+
+# 保存进程标识的环境变量，插件重新加载（模块被重新导入）后标识不变
+PROCESS_TOKEN_ENV = "NICESUNO_PROCESS_TOKEN"
+
+
+# 当前进程的标识：进程号加随机串，避免容器重启后进程号相同而误判
+def process_token():
+    token = os.environ.get(PROCESS_TOKEN_ENV, "")
+    if not token.startswith(f"{os.getpid()}-"):
+        token = os.environ[PROCESS_TOKEN_ENV] = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+    return token
+
+
+# 创作任务日志：在SQLite（WAL模式）中记录每个任务的状态变化，插件重启后据此恢复未完成的任务
+# 任务状态：submitted -> video_sent -> done；音乐状态：audio_ready -> downloaded -> audio_sent -> cover_sent、video_ready
+# 每个任务记录所属的插件实例（owner），插件在进程内重新加载时，旧实例的线程仍在运行并继续发送它的任务，新实例不再恢复这些任务
+class JobJournal:
+    def __init__(self, path):
+        self.path = path
+        self.owner = f"{process_token()}:{uuid.uuid4().hex[:8]}"
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "job_id TEXT PRIMARY KEY, kind TEXT, suno_api_base TEXT, ids TEXT, prompt TEXT, "
+            "context TEXT, cache_key TEXT, state TEXT, created_at REAL, updated_at REAL)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS events ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, job_id TEXT, clip_id TEXT, state TEXT, data TEXT, created_at REAL)")
+        # 早期版本的数据库没有owner列
+        if "owner" not in [row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")]:
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs (state)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_events_job_id ON events (job_id)")
+
+    # 记录新提交的任务，kind为music或lyrics，ids为aid列表或[lid]；写入失败时只记录日志，不影响任务本身
+    def add_job(self, job_id, kind, suno_api_base, ids: List, prompt, context_data, cache_key=None):
+        now = time.time()
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO jobs (job_id, kind, suno_api_base, ids, prompt, context, cache_key, state, "
+                    "created_at, updated_at, owner) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (job_id, kind, suno_api_base, json.dumps(ids), prompt, json.dumps(context_data, ensure_ascii=False),
+                     cache_key, "submitted", now, now, self.owner))
+        except Exception as e:
+            logger.warning(f"[Nicesuno] failed to add job, job_id={job_id}, kind={kind}, error={e}")
+
+    # 记录状态变化，clip_id为空时为任务状态，否则为其中一首音乐的状态
+    def record(self, job_id, state, clip_id=None, data=None):
+        now = time.time()
+        try:
+            with self._lock:
+                self._conn.execute("BEGIN")
+                self._conn.execute(
+                    "INSERT INTO events (job_id, clip_id, state, data, created_at) VALUES (?, ?, ?, ?, ?)",
+                    (job_id, clip_id, state, json.dumps(data, ensure_ascii=False) if data else None, now))
+                if clip_id is None:
+                    self._conn.execute("UPDATE jobs SET state = ?, updated_at = ? WHERE job_id = ?", (state, now, job_id))
+                else:
+                    self._conn.execute("UPDATE jobs SET updated_at = ? WHERE job_id = ?", (now, job_id))
+                self._conn.execute("COMMIT")
+        except Exception as e:
+            logger.warning(f"[Nicesuno] failed to record job state, job_id={job_id}, state={state}, error={e}")
+            # 连接不可用时回滚也会失败，忽略即可
+            with self._lock:
+                try:
+                    if self._conn.in_transaction:
+                        self._conn.execute("ROLLBACK")
+                except Exception:
+                    pass
+
+    # 加载max_age_seconds内提交的未完成任务，更早的任务标记为expired；
+    # 本进程中其他插件实例的任务由该实例继续处理，不会返回；返回的任务改为属于当前实例
+    def unfinished_jobs(self, max_age_seconds):
+        now = time.time()
+        with self._lock:
+            self._conn.execute("UPDATE jobs SET state = 'expired', updated_at = ? WHERE state != 'done' AND state != 'expired' "
+                               "AND created_at < ?", (now, now - max_age_seconds))
+            rows = self._conn.execute(
+                "SELECT job_id, kind, suno_api_base, ids, prompt, context, cache_key, state, created_at FROM jobs "
+                "WHERE state != 'done' AND state != 'expired' AND (owner IS NULL OR owner NOT LIKE ?) ORDER BY created_at",
+                (f"{process_token()}:%",)).fetchall()
+            self._conn.executemany("UPDATE jobs SET owner = ? WHERE job_id = ?", [(self.owner, row[0]) for row in rows])
+            jobs = []
+            for job_id, kind, suno_api_base, ids, prompt, context, cache_key, state, created_at in rows:
+                events = self._conn.execute(
+                    "SELECT clip_id, state, data FROM events WHERE job_id = ? ORDER BY id", (job_id,)).fetchall()
+                jobs.append({
+                    "job_id": job_id,
+                    "kind": kind,
+                    "suno_api_base": suno_api_base,
+                    "ids": json.loads(ids),
+                    "prompt": prompt,
+                    "context": json.loads(context),
+                    "cache_key": cache_key,
+                    "state": state,
+                    "created_at": created_at,
+                    "events": [(clip_id, event_state, json.loads(data) if data else {}) for clip_id, event_state, data in events],
+                })
+        return jobs
+
+    # 删除keep_seconds之前已结束的任务
+    def prune(self, keep_seconds):
+        before = time.time() - keep_seconds
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.execute("DELETE FROM events WHERE job_id IN "
+                               "(SELECT job_id FROM jobs WHERE state IN ('done', 'expired') AND updated_at < ?)", (before,))
+            self._conn.execute("DELETE FROM jobs WHERE state IN ('done', 'expired') AND updated_at < ?", (before,))
+            self._conn.execute("COMMIT")
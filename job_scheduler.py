@@ -0,0 +1,72 @@
+# encoding:utf-8
+import math
+import queue
+import threading
+from collections import deque
+from typing import Callable
+
+from common.log import logger
+
+# 没有历史数据时，假设一次创作任务占用名额的时长（秒）
+DEFAULT_JOB_SECONDS = 180
+
+
+# 创作任务调度器：固定数量的工作线程从有界队列中依次取出任务执行，队列已满时拒绝新任务
+class JobScheduler:
+    def __init__(self, workers=2, max_queue_size=20):
+        self.workers = max(workers, 1)
+        self._queue = queue.Queue(maxsize=max(max_queue_size, 1))
+        # 已提交但尚未执行完毕的任务数，以及其中尚未占用后端名额的任务数
+        self._pending = 0
+        self._waiting = 0
+        self._durations = deque(maxlen=20)
+        self._lock = threading.Lock()
+        self._threads = []
+
+    # 提交任务，返回排队位置（从1开始）；队列已满时抛出queue.Full
+    def submit(self, job: Callable):
+        with self._lock:
+            self._queue.put_nowait(job)
+            self._pending += 1
+            self._waiting += 1
+            position = self._waiting
+            self._ensure_started()
+        return position
+
+    # 任务已占用后端名额，不再计入排队位置
+    def mark_started(self):
+        with self._lock:
+            self._waiting = max(self._waiting - 1, 0)
+
+    def pending_count(self):
+        with self._lock:
+            return self._pending
+
+    # 记录一次任务从提交到完成的时长，用于估算排队时间
+    def record_duration(self, seconds):
+        with self._lock:
+            self._durations.append(seconds)
+
+    # 估算排在position位的任务需要等待的时长（秒），capacity为可同时进行的任务数
+    def estimate_wait(self, position, capacity):
+        with self._lock:
+            average = sum(self._durations) / len(self._durations) if self._durations else DEFAULT_JOB_SECONDS
+        return math.ceil(position / max(capacity, 1)) * average
+
+    def _ensure_started(self):
+        self._threads = [thread for thread in self._threads if thread.is_alive()]
+        for i in range(self.workers - len(self._threads)):
+            thread = threading.Thread(target=self._run, name="nicesuno-job-worker", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            try:
+                job()
+            except Exception as e:
+                logger.error(f"[Nicesuno] job failed, error={e}")
+            finally:
+                with self._lock:
+                    self._pending -= 1
@@ -0,0 +1,134 @@
+# encoding:utf-8
+import math
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from common.log import logger
+
+# 耗时直方图的桶上限（秒）
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+# 次数直方图的桶上限，例如每首音乐的轮询次数
+COUNT_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+
+# 固定桶的直方图，只保存各桶计数、总和与总数
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        index = 0
+        while index < len(self.buckets) and value > self.buckets[index]:
+            index += 1
+        self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+    # 按桶估算分位数，返回所在桶的上限，落在最后一个桶时返回inf
+    def quantile(self, q):
+        if not self.count:
+            return 0
+        rank, cumulative = q * self.count, 0
+        for index, count in enumerate(self.counts):
+            cumulative += count
+            if cumulative >= rank:
+                return self.buckets[index] if index < len(self.buckets) else math.inf
+        return math.inf
+
+
+# 插件的运行指标：各阶段耗时直方图，以及按Suno-API、失败原因等标签分组的计数器
+# 标签以排序后的(key, value)元组保存，导出为Prometheus文本格式，或汇总为聊天消息
+class Metrics:
+    def __init__(self):
+        self._histograms = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    # 记录一次耗时或次数，name以_seconds结尾时使用耗时桶，否则使用次数桶
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(LATENCY_BUCKETS if name.endswith("_seconds") else COUNT_BUCKETS)
+            histogram.observe(value)
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    # 导出为Prometheus文本格式，指标名加上nicesuno_前缀
+    def prometheus_text(self):
+        lines, typed = [], set()
+        with self._lock:
+            for (name, labels), value in sorted(self._counters.items()):
+                if name not in typed:
+                    typed.add(name)
+                    lines.append(f"# TYPE nicesuno_{name} counter")
+                lines.append(f"nicesuno_{name}{self._format_labels(labels)} {value}")
+            for (name, labels), histogram in sorted(self._histograms.items()):
+                if name not in typed:
+                    typed.add(name)
+                    lines.append(f"# TYPE nicesuno_{name} histogram")
+                cumulative = 0
+                for index, count in enumerate(histogram.counts):
+                    cumulative += count
+                    le = histogram.buckets[index] if index < len(histogram.buckets) else "+Inf"
+                    lines.append(f"nicesuno_{name}_bucket{self._format_labels(labels + (('le', le),))} {cumulative}")
+                lines.append(f"nicesuno_{name}_sum{self._format_labels(labels)} {histogram.sum}")
+                lines.append(f"nicesuno_{name}_count{self._format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    # 汇总为便于在聊天中查看的文本：各阶段的次数、平均值和P50/P90，以及各计数器
+    def summary(self):
+        lines = []
+        with self._lock:
+            for (name, labels), histogram in sorted(self._histograms.items()):
+                if not histogram.count:
+                    continue
+                average = histogram.sum / histogram.count
+                lines.append(f"{name}{self._format_labels(labels)}: n={histogram.count}, avg={average:.2f}, "
+                             f"p50≤{histogram.quantile(0.5)}, p90≤{histogram.quantile(0.9)}")
+            for (name, labels), value in sorted(self._counters.items()):
+                lines.append(f"{name}{self._format_labels(labels)}: {value}")
+        return "\n".join(lines) if lines else "暂无数据"
+
+    @staticmethod
+    def _format_labels(labels):
+        if not labels:
+            return ""
+        pairs = []
+        for key, value in labels:
+            value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+            pairs.append(f'{key}="{value}"')
+        return "{" + ",".join(pairs) + "}"
+
+
+# 在本地端口上以Prometheus文本格式导出指标，GET /metrics
+class MetricsServer:
+    def __init__(self, metrics: Metrics, port, host="127.0.0.1"):
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.prometheus_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self._thread = threading.Thread(target=self.server.serve_forever, name="nicesuno-metrics", daemon=True)
+        self._thread.start()
+        logger.info(f"[Nicesuno] metrics server started, address=http://{host}:{port}/metrics")
+
@@ -0,0 +1,97 @@
+# encoding:utf-8
+import time
+import uuid
+import threading
+from typing import List
+
+
+# 一首音乐的发送进度
+class ClipState:
+    def __init__(self, aid):
+        self.aid = aid
+        self.audio_done = False
+        self.audio_ready_at = None
+        self.stream_url = None
+        self.title = None
+        self.lyrics = None
+        self.tags = None
+        self.description_prompt = None
+        self.audio_url = None
+        self.audio_path = None
+        self.audio_sent = False
+        self.image_url = None
+        self.cover_done = False
+        self.video_url = None
+
+    # 已发送的音乐信息，用于写入创作结果缓存和任务日志
+    def result(self):
+        return {
+            "aid": self.aid,
+            "title": self.title,
+            "lyrics": self.lyrics,
+            "tags": self.tags,
+            "description_prompt": self.description_prompt,
+            "audio_url": self.audio_url,
+            "audio_path": self.audio_path,
+            "image_url": self.image_url,
+            "video_url": self.video_url,
+        }
+
+
+# 一次音乐创作任务的发送进度，由轮询回调和发送线程共同更新，读写时需持有lock
+class MusicJob:
+    def __init__(self, channel, context, suno_api_base, aids: List, send_covers=True, cache_key=None, job_id=None):
+        self.job_id = job_id or uuid.uuid4().hex
+        self.channel = channel
+        self.context = context
+        self.suno_api_base = suno_api_base
+        self.aids = aids
+        self.clips = {aid: ClipState(aid) for aid in aids}
+        self.send_covers = send_covers
+        self.cache_key = cache_key
+        self.last_lyrics = ""
+        self.finished = False
+        self.created_at = time.time()
+        self.lock = threading.Lock()
+
+    # 所有音乐、封面和视频都已处理完毕（发送成功或放弃）
+    def is_complete(self):
+        for clip in self.clips.values():
+            if not clip.audio_done or clip.video_url is None:
+                return False
+            if self.send_covers and clip.audio_sent and not clip.cover_done:
+                return False
+        return True
+
+    # 已成功发送的音乐，用于写入创作结果缓存
+    def results(self):
+        results = []
+        for aid in self.aids:
+            clip = self.clips[aid]
+            if not clip.audio_sent:
+                continue
+            results.append(clip.result())
+        return results
+
+    # 根据任务日志中的状态变化恢复发送进度
+    def restore(self, events):
+        for clip_id, state, data in events:
+            clip = self.clips.get(clip_id)
+            if not clip:
+                continue
+            if state == "stream_sent":
+                clip.stream_url = data.get("stream_url")
+            elif state == "audio_sent":
+                clip.audio_done, clip.audio_sent = True, True
+                clip.title, clip.lyrics, clip.tags = data.get("title"), data.get("lyrics"), data.get("tags")
+                clip.description_prompt = data.get("description_prompt")
+                clip.audio_url, clip.audio_path = data.get("audio_url"), data.get("audio_path")
+                self.last_lyrics = clip.lyrics
+            elif state == "audio_failed":
+                clip.audio_done, clip.cover_done, clip.video_url = True, True, "获取失败！"
+            elif state == "cover_sent":
+                clip.cover_done, clip.image_url = True, data.get("image_url")
+            elif state == "cover_failed":
+                clip.cover_done = True
+            elif state == "video_ready":
+                clip.video_url = data.get("video_url")
@@ -2,17 +2,47 @@
 import os
 import re
 import json
+import logging
+import math
 import time
-import requests
-import threading
+import queue
+import functools
+from types import SimpleNamespace
 from typing import List
+from concurrent.futures import ThreadPoolExecutor
 from pathvalidate import sanitize_filename
 
 import plugins
-from bridge.context import ContextType
+from bridge.context import Context, ContextType
 from bridge.reply import Reply, ReplyType
 from common.log import logger
 from plugins import *
+from .backend_pool import BackendPool
+from .feed_poller import FeedPoller
+from .polling_policy import PollingPolicy
+from .job_scheduler import JobScheduler
+from .async_client import AsyncSunoClient
+from .http_session import HttpSessionPool, DOWNLOAD_CHUNK_SIZE
+from .music_job import MusicJob
+from .result_cache import ResultCache
+from .job_journal import JobJournal
+from .storage_manager import StorageManager
+from .rate_limiter import RateLimiter
+from .metrics import Metrics, MetricsServer
+
+# 自定义模式的提示词格式
+CUSTOM_MODE_PATTERN = re.compile(r' *标题[:：]?(?P<title>[\S ]*)\n+ *风格[:：]?(?P<tags>[\S ]*)(\n+(?P<lyrics>.*))?', re.DOTALL)
+# 恢复任务时需要保留的消息属性
+CONTEXT_MSG_ATTRS = ("msg_id", "from_user_id", "from_user_nickname", "to_user_id", "to_user_nickname",
+                     "other_user_id", "other_user_nickname", "actual_user_id", "actual_user_nickname", "is_group")
+# 创作失败的原因，作为指标标签时只使用这几个固定的值，其他detail统一记为other
+GENERATE_ERROR_REASONS = {
+    "Insufficient credits.": "insufficient_credits",
+    "Unauthorized": "unauthorized",
+    "Too many running jobs.": "too_many_running_jobs",
+    "Topic too long.": "topic_too_long",
+}
+
 
 @plugins.register(
     name="Nicesuno",
@@ -43,6 +73,34 @@ class Nicesuno(Plugin):
             self.music_output_dir = conf.get("music_output_dir", "/tmp")
             self.is_send_lyrics = conf.get("is_send_lyrics", True)
             self.is_send_covers = conf.get("is_send_covers", True)
+            self.is_send_stream_url = conf.get("is_send_stream_url", False)
+            self.suno_backend_cooldown_seconds = conf.get("suno_backend_cooldown_seconds", {})
+            self.max_jobs_per_backend = conf.get("max_jobs_per_backend", 2)
+            self.job_workers = conf.get("job_workers", 4)
+            self.job_queue_size = conf.get("job_queue_size", 20)
+            self.job_wait_seconds = conf.get("job_wait_seconds", 600)
+            self.delivery_workers = conf.get("delivery_workers", 8)
+            self.suno_async_engine = conf.get("suno_async_engine", False)
+            self.http_pool_size = conf.get("http_pool_size", 10)
+            self.http_max_retries = conf.get("http_max_retries", 2)
+            self.http_keep_alive = conf.get("http_keep_alive", True)
+            self.polling_policy = conf.get("polling_policy", {})
+            self.result_cache_ttl_seconds = conf.get("result_cache_ttl_seconds", 86400)
+            self.result_cache_size = conf.get("result_cache_size", 100)
+            self.result_cache_path = conf.get("result_cache_path", "")
+            self.is_journal_jobs = conf.get("is_journal_jobs", True)
+            self.job_journal_path = conf.get("job_journal_path", "")
+            self.job_resume_max_age_seconds = conf.get("job_resume_max_age_seconds", 21600)
+            self.job_journal_keep_seconds = conf.get("job_journal_keep_seconds", 604800)
+            self.music_output_max_mb = conf.get("music_output_max_mb", 1024)
+            self.music_output_max_age_seconds = conf.get("music_output_max_age_seconds", 604800)
+            self.storage_sweep_interval_seconds = conf.get("storage_sweep_interval_seconds", 300)
+            self.rate_limits = conf.get("rate_limits", {})
+            self.metrics_port = conf.get("metrics_port", 0)
+            self.admin_users = conf.get("admin_users", [])
+            # 预编译指令和创作前缀，与创作无关的消息只需一次集合查找即可忽略
+            self.stats_command = self._get_stats_command()
+            self.prefix_pattern, self.prefix_first_chars = self._compile_prefixes()
             if not os.path.exists(self.music_output_dir):
                 logger.info(f"[Nicesuno] music_output_dir={self.music_output_dir} not exists, create it.")
                 os.makedirs(self.music_output_dir)
@@ -52,8 +110,52 @@ class Nicesuno(Plugin):
                 logger.info("[Nicesuno] inited")
             else:
                 logger.warn("[Nicesuno] init failed because suno_api_bases or music_create_prefixes is incorrect.")
-            # 待实现：部署多套Suno-API，实现限额后自动切换Suno账号
-            self.suno_api_base = self.suno_api_bases[0]
+            # 运行指标，metrics_port不为0时在本地端口上以Prometheus文本格式导出
+            self.metrics = Metrics()
+            if self.metrics_port:
+                try:
+                    MetricsServer(self.metrics, self.metrics_port)
+                except Exception as e:
+                    logger.warning(f"[Nicesuno] failed to start metrics server, port={self.metrics_port}, error={e}")
+            # 部署多套Suno-API，轮询分配创作任务，限额后自动切换Suno账号
+            self.backend_pool = BackendPool(self.suno_api_bases if isinstance(self.suno_api_bases, List) else [],
+                                            self.suno_backend_cooldown_seconds, self.max_jobs_per_backend)
+            # 每个Suno-API和CDN下载各使用一个复用连接的HTTP会话
+            self.http_sessions = HttpSessionPool(self.http_pool_size, self.http_max_retries, keep_alive=self.http_keep_alive)
+            # 可选的asyncio引擎，开启后所有Suno-API请求和下载都在同一个事件循环线程中执行
+            self.async_client = None
+            if self.suno_async_engine:
+                try:
+                    self.async_client = AsyncSunoClient(pool_size=self.http_pool_size, keep_alive=self.http_keep_alive)
+                    logger.info("[Nicesuno] suno_async_engine enabled.")
+                except ImportError as e:
+                    logger.warning(f"[Nicesuno] suno_async_engine disabled, error={e}")
+            # 音乐文件存储管理，限制music_output_dir的容量和文件保留时间
+            self.storage = StorageManager(self.music_output_dir, self.music_output_max_mb * 1024 * 1024,
+                                          self.music_output_max_age_seconds, self.storage_sweep_interval_seconds)
+            # 按用户、群和全局限流，避免个别用户耗尽Suno额度
+            self.rate_limiter = RateLimiter(self.rate_limits)
+            # 创作任务调度器，限制工作线程数和排队长度
+            self.job_scheduler = JobScheduler(self.job_workers, self.job_queue_size)
+            # 创作结果缓存，result_cache_ttl_seconds为0时不缓存
+            self.result_cache = None
+            if self.result_cache_ttl_seconds:
+                self.result_cache = ResultCache(self.result_cache_ttl_seconds, self.result_cache_size, self.result_cache_path or None)
+            # 统一轮询服务，以及发送音乐、封面和歌词的线程池
+            self.feed_poller = FeedPoller(self._suno_get_feed, self._suno_get_lyrics, PollingPolicy(**self.polling_policy),
+                                          stream_audio=self.is_send_stream_url, metrics=self.metrics,
+                                          fetch_feeds=self._suno_get_feeds if self.async_client else None)
+            self.delivery_executor = ThreadPoolExecutor(max_workers=self.delivery_workers, thread_name_prefix="nicesuno-delivery")
+            # 任务日志，记录每个任务的状态变化，并恢复插件重启前未完成的任务
+            self.job_journal = None
+            if self.is_journal_jobs:
+                # 任务日志不可用（数据库损坏、无法写入等）时不记录任务，不影响插件加载
+                try:
+                    self.job_journal = JobJournal(self.job_journal_path or os.path.join(self.music_output_dir, "nicesuno_jobs.db"))
+                    self._resume_jobs()
+                except Exception as e:
+                    logger.warning(f"[Nicesuno] job journal disabled, error={e}")
+                    self.job_journal = None
         except Exception as e:
             logger.error(f"[Nicesuno] init failed, ignored.")
             raise e
@@ -65,30 +167,36 @@ class Nicesuno(Plugin):
             if context.type != ContextType.TEXT:
                 return
             content = context.content
+
+            # 判断是否为指令或包含创作的前缀，其他消息直接忽略
+            mode, suno_prompt = self._match_prefix(content)
+            if not mode:
+                return
             logger.debug(f"[Nicesuno] on_handle_context. content={content}")
 
-            # 判断是否包含创作的前缀
-            make_instrumental, make_lyrics = False, False
-            music_create_prefix = self._check_prefix(content, self.music_create_prefixes)
-            instrumental_create_prefix = self._check_prefix(content, self.instrumental_create_prefixes)
-            lyrics_create_prefix = self._check_prefix(content, self.lyrics_create_prefixes)
-            if music_create_prefix:
-                suno_prompt = content[len(music_create_prefix):].strip()
-            elif instrumental_create_prefix:
-                make_instrumental = True
-                suno_prompt = content[len(instrumental_create_prefix):].strip()
-            elif lyrics_create_prefix:
-                make_lyrics = True
-                suno_prompt = content[len(lyrics_create_prefix):].strip()
-            else:
-                logger.debug(f"[Nicesuno] content starts without any suno prefixes, ignored.")
+            # 管理员查看运行指标
+            if mode == "stats":
+                text = self._get_stats_text() if self._is_admin(context) else "抱歉！该指令仅管理员可用🥺"
+                e_context["reply"] = Reply(ReplyType.TEXT, text)
+                e_context.action = EventAction.BREAK_PASS
                 return
+            make_instrumental, make_lyrics = mode == "instrumental", mode == "lyrics"
 
             # 判断是否包含创作的提示词
             if not suno_prompt:
                 logger.info("[Nicesuno] content starts without any suno prompts, ignored.")
                 return
 
+            # 判断是否超出创作频率限制，超出时直接回复可以再次创作的时间
+            wait_seconds = self._check_rate_limit(context)
+            if wait_seconds:
+                logger.info(f"[Nicesuno] rate limited, wait_seconds={wait_seconds:.0f}")
+                self.metrics.inc("rate_limited_total")
+                reply = Reply(ReplyType.TEXT, f"您创作得太频繁啦😂请{self._format_seconds(wait_seconds)}后再来...")
+                e_context["reply"] = reply
+                e_context.action = EventAction.BREAK_PASS
+                return
+
             # 开始创作
             if make_lyrics:
                 logger.info(f"[Nicesuno] start generating lyrics, suno_prompt={suno_prompt}.")
@@ -103,22 +211,86 @@ class Nicesuno(Plugin):
             e_context["reply"] = reply
             e_context.action = EventAction.BREAK_PASS
 
+    # 查看运行指标的指令，使用插件指令的统一前缀
+    def _get_stats_command(self):
+        try:
+            from config import conf
+            trigger_prefix = conf().get("plugin_trigger_prefix", "$")
+        except Exception:
+            trigger_prefix = "$"
+        return f"{trigger_prefix}suno stats"
+
+    # 判断是否为管理员：本插件配置的admin_users中的用户ID，或者通过godcmd认证的管理员
+    def _is_admin(self, context):
+        msg = context["msg"]
+        user_id = msg.actual_user_id if context.get("isgroup", False) else msg.from_user_id
+        if not user_id:
+            return False
+        if user_id in self.admin_users:
+            return True
+        try:
+            from config import global_config
+            return user_id in global_config.get("admin_users", [])
+        except Exception:
+            return False
+
+    # 运行指标汇总，以及当前的排队、轮询和Suno-API状态
+    def _get_stats_text(self):
+        lines = [f"排队任务数: {self.job_scheduler.pending_count()}", f"轮询中的任务数: {self.feed_poller.pending_count()}"]
+        now = time.time()
+        for backend in self.backend_pool.backends:
+            status = f"暂停至{time.strftime('%H:%M:%S', time.localtime(backend.cooldown_until))}（{backend.cooldown_reason}）" \
+                if backend.cooldown_until > now else "可用"
+            lines.append(f"{backend.base}: 进行中{backend.in_flight}个任务，{status}")
+        return "\n".join(lines) + "\n\n" + self.metrics.summary()
+
+    # 检查用户、群和全局的创作频率限制，返回需要等待的秒数，未超出时返回0
+    def _check_rate_limit(self, context):
+        if not self.rate_limiter.enabled():
+            return 0
+        return self.rate_limiter.acquire(self._rate_limit_keys(context))
+
+    # 请求最终没有提交创作（格式错误、排队已满、重放缓存结果等）时退还令牌，不计入创作频率
+    def _refund_rate_limit(self, context):
+        if self.rate_limiter.enabled():
+            self.rate_limiter.refund(self._rate_limit_keys(context))
+
+    def _rate_limit_keys(self, context):
+        msg = context["msg"]
+        return {
+            "user": msg.actual_user_nickname or msg.other_user_nickname,
+            "group": (msg.other_user_id or msg.other_user_nickname) if context.get("isgroup", False) else None,
+            "global": "global",
+        }
+
+    # 把秒数转换为便于阅读的时间
+    def _format_seconds(self, seconds):
+        seconds = math.ceil(seconds)
+        if seconds < 60:
+            return f"{seconds}秒"
+        minutes = math.ceil(seconds / 60)
+        if minutes < 60:
+            return f"{minutes}分钟"
+        return f"{minutes // 60}小时{minutes % 60}分钟" if minutes % 60 else f"{minutes // 60}小时"
+
     # 创作音乐
     def _create_music(self, e_context, suno_prompt, make_instrumental=False):
+        channel = e_context["channel"]
+        context = e_context["context"]
         custom_mode = False
         # 自定义模式
         if '标题' in suno_prompt and '风格' in suno_prompt:
-            regex_prompt = r' *标题[:：]?(?P<title>[\S ]*)\n+ *风格[:：]?(?P<tags>[\S ]*)(\n+(?P<lyrics>.*))?'
-            r = re.fullmatch(regex_prompt, suno_prompt, re.DOTALL)
+            r = CUSTOM_MODE_PATTERN.fullmatch(suno_prompt)
             title = r.group('title').strip() if r and r.group('title') else None
             tags = r.group('tags').strip() if r and r.group('tags') else None
             lyrics = r.group('lyrics').strip() if r and r.group('lyrics') else None
             if r and (tags or lyrics):
                 custom_mode = True
                 logger.info(f"[Nicesuno] generating {'instrumental' if make_instrumental else 'vocal'} music in custom mode, title={title}, tags={tags}, lyrics={lyrics}")
-                data = self._suno_generate_music_custom_mode(title, tags, lyrics, make_instrumental)
+                generate_args = (self._suno_generate_music_custom_mode, title, tags, lyrics, make_instrumental)
             else:
                 logger.warning(f"[Nicesuno] generating {'instrumental' if make_instrumental else 'vocal'} music in custom mode failed because of wrong format, suno_prompt={suno_prompt}")
+                self._refund_rate_limit(context)
                 reply = Reply(ReplyType.TEXT, self.get_help_text())
                 e_context["reply"] = reply
                 e_context.action = EventAction.BREAK_PASS
@@ -126,10 +298,48 @@ class Nicesuno(Plugin):
         # 描述模式
         else:
             logger.info(f"[Nicesuno] generating {'instrumental' if make_instrumental else 'vocal'} music with description, description={suno_prompt}")
-            data = self._suno_generate_music_with_description(suno_prompt, make_instrumental)
-        
-        channel = e_context["channel"]
-        context = e_context["context"]
+            generate_args = (self._suno_generate_music_with_description, suno_prompt, make_instrumental)
+        to_user_nickname = context["msg"].to_user_nickname
+        ack_text = f"{to_user_nickname}正在为您创作音乐，请稍等☕"
+        # 相同的创作请求直接重放缓存的结果，或者等待正在创作的相同任务，不再消耗Suno额度
+        cache_key = None
+        if self.result_cache:
+            cache_key = ResultCache.make_key(custom_mode, make_instrumental, *generate_args[1:-1])
+            entry = self.result_cache.get(cache_key)
+            if entry:
+                logger.info(f"[Nicesuno] result cache hit, cache_key={cache_key}")
+                self.metrics.inc("cache_hits_total")
+                self._refund_rate_limit(context)
+                self.delivery_executor.submit(self._replay_music, channel, context, entry["clips"])
+                e_context["reply"] = Reply(ReplyType.TEXT, ack_text)
+                e_context.action = EventAction.BREAK_PASS
+                return
+            if not self.result_cache.begin(cache_key, (channel, context)):
+                logger.info(f"[Nicesuno] identical job in flight, waiting for its result, cache_key={cache_key}")
+                self._refund_rate_limit(context)
+                e_context["reply"] = Reply(ReplyType.TEXT, ack_text)
+                e_context.action = EventAction.BREAK_PASS
+                return
+        reply = self._schedule_job(channel, context, ack_text, self._submit_music, channel, context, suno_prompt,
+                                   custom_mode, generate_args, cache_key, cache_key=cache_key)
+        if reply:
+            e_context["reply"] = reply
+        e_context.action = EventAction.BREAK_PASS
+
+    # 提交音乐创作任务（在工作线程中执行），返回需要发送的错误提示，创建成功时返回None
+    # 创作失败时，等待相同任务的请求也会收到同样的错误提示
+    def _submit_music(self, channel, context, suno_prompt, custom_mode, generate_args, cache_key=None, backend=None, deadline=0):
+        reply = Reply(ReplyType.TEXT, "抱歉！创作失败了，请稍后再试🥺")
+        try:
+            reply = self._generate_music(channel, context, suno_prompt, custom_mode, generate_args, cache_key, backend, deadline)
+            return reply
+        finally:
+            if reply:
+                self._finish_cached_music(cache_key, reply=reply)
+
+    # 提交音乐创作任务，并根据Suno-API的返回结果生成错误提示
+    def _generate_music(self, channel, context, suno_prompt, custom_mode, generate_args, cache_key, backend, deadline=0):
+        suno_api_base, data = self._suno_generate(*generate_args, backend=backend, deadline=deadline)
         to_user_nickname = context["msg"].to_user_nickname
         if not data:
             logger.warning(f"response data of _suno_generate_music is empty.")
@@ -141,7 +351,12 @@ class Nicesuno(Plugin):
         elif data.get('detail') == 'Insufficient credits.':
             logger.warning(f"[Nicesuno] insufficient credits with description, changed to generating lyrics...")
             reply = Reply(ReplyType.TEXT, f"Suno老师说一天只能创作5次😂今天确实唱够了，{to_user_nickname}来为你写歌好不好😘")
-            self._create_lyrics(e_context, suno_prompt)
+            # 额度用完时各后端的名额通常被仍在轮询的音乐任务占满，改写歌词不受名额上限限制
+            try:
+                self._submit_lyrics(channel, context, suno_prompt, ignore_limit=True)
+            except Exception as e:
+                logger.warning(f"[Nicesuno] failed to generate lyrics instead, error={e}")
+                reply = Reply(ReplyType.TEXT, f"Suno老师说一天只能创作5次😂今天确实唱够了，明天11点之后再来好不好😘")
         # 如果Suno-API的Token失效
         elif data.get('detail'):
             logger.warning(f"[Nicesuno] error occurred, response data={data}")
@@ -155,156 +370,462 @@ class Nicesuno(Plugin):
                 reply = Reply(ReplyType.TEXT, f"因为{data.get('detail')}，创作失败了😂请稍后再试...")
         elif not data.get('clips'):
             logger.warning(f"[Nicesuno] no clips in response data, response data={data}")
+            self.backend_pool.release(suno_api_base)
             reply = Reply(ReplyType.TEXT, f"因为神秘原因，创作失败了😂请稍后再试...")
         # 获取和发送音乐
         else:
             aids = [clip['id'] for clip in data['clips']]
-            logger.debug(f"[Nicesuno] start to handle music, aids={aids}, data={data}")
-            threading.Thread(target=self._handle_music, args=(channel, context, aids)).start()
-            reply = Reply(ReplyType.TEXT, f"{to_user_nickname}正在为您创作音乐，请稍等☕")
-        e_context["reply"] = reply
-        e_context.action = EventAction.BREAK_PASS
+            logger.debug(f"[Nicesuno] start to handle music, suno_api_base={suno_api_base}, aids={aids}, data={data}")
+            self._handle_music(channel, context, suno_api_base, aids, cache_key, suno_prompt)
+            reply = None
+        return reply
 
     # 创作歌词
     def _create_lyrics(self, e_context, suno_prompt):
-        data = self._suno_generate_lyrics(suno_prompt)
         channel = e_context["channel"]
         context = e_context["context"]
+        reply = self._schedule_job(channel, context, None, self._submit_lyrics, channel, context, suno_prompt)
+        if reply:
+            e_context["reply"] = reply
+        e_context.action = EventAction.BREAK_PASS
+
+    # 提交歌词创作任务（在工作线程中执行），歌词创作完成后直接发送，无需回复消息
+    def _submit_lyrics(self, channel, context, suno_prompt, backend=None, deadline=0, ignore_limit=False):
+        suno_api_base, data = self._suno_generate(self._suno_generate_lyrics, suno_prompt, backend=backend, deadline=deadline,
+                                                  ignore_limit=ignore_limit)
         if not data:
             error = f"response data of _suno_generate_lyrics is empty."
             raise Exception(error)
+        elif data.get('detail'):
+            raise Exception(f"failed to generate lyrics, detail={data.get('detail')}")
         # 获取和发送歌词
         lid = data['id']
-        logger.debug(f"[Nicesuno] start to handle lyrics, lid={lid}, data={data}")
-        threading.Thread(target=self._handle_lyric, args=(channel, context, lid, suno_prompt)).start()
-        e_context.action = EventAction.BREAK_PASS
+        logger.debug(f"[Nicesuno] start to handle lyrics, suno_api_base={suno_api_base}, lid={lid}, data={data}")
+        self._handle_lyric(channel, context, suno_api_base, lid, suno_prompt)
+        return None
 
-    # 下载和发送音乐
-    def _handle_music(self, channel, context, aids: List):
-        # 用户信息
-        actual_user_nickname = context["msg"].actual_user_nickname or context["msg"].other_user_nickname
+    # 将任务交给工作线程提交，消息处理线程不等待Suno-API，立即返回确认消息：
+    # 有空闲名额时返回ack_text，需要排队时返回排队位置和预计等待时间，所有后端都已下线时由工作线程直接发送错误提示
+    def _schedule_job(self, channel, context, ack_text, submit_func, *args, cache_key=None):
         to_user_nickname = context["msg"].to_user_nickname
-        # 获取歌词和音乐
-        initial_delay_seconds = 15
-        last_lyrics = ""
-        for aid in aids:
-            # 获取音乐信息
-            start_time = time.time()
-            while True:
-                if initial_delay_seconds:
-                    time.sleep(initial_delay_seconds)
-                    initial_delay_seconds = 0
-                data = self._suno_get_music(aid)
+        free_slots = self.backend_pool.free_slots()
+        try:
+            position = self.job_scheduler.submit(functools.partial(self._run_queued_job, channel, context, time.time(), submit_func, *args))
+        except queue.Full:
+            logger.warning(f"[Nicesuno] job queue is full, rejected.")
+            self.metrics.inc("queue_full_total")
+            self._refund_rate_limit(context)
+            reply = Reply(ReplyType.TEXT, f"Suno老师的排队名额已满😂请稍后再来...")
+            self._finish_cached_music(cache_key, reply=reply)
+            return reply
+        if not self.backend_pool.has_available():
+            return None
+        if position <= free_slots:
+            return Reply(ReplyType.TEXT, ack_text) if ack_text else None
+        position -= free_slots
+        wait_minutes = math.ceil(self.job_scheduler.estimate_wait(position, self.backend_pool.capacity()) / 60)
+        logger.info(f"[Nicesuno] job queued, position={position}, wait_minutes={wait_minutes}")
+        return Reply(ReplyType.TEXT, f"{to_user_nickname}已收到您的创作请求，当前排在第{position}位，预计等待{wait_minutes}分钟☕")
+
+    # 在工作线程中执行任务，等待后端名额后提交，错误提示通过channel发送
+    def _run_queued_job(self, channel, context, queued_at, submit_func, *args):
+        try:
+            # 等待名额的时间上限，切换后端时继续使用剩余的时间
+            deadline = time.time() + self.job_wait_seconds
+            backend = self.backend_pool.acquire(timeout=self.job_wait_seconds)
+            self.job_scheduler.mark_started()
+            self.metrics.observe("queue_wait_seconds", time.time() - queued_at)
+            reply = submit_func(*args, backend=backend, deadline=deadline)
+        except Exception as e:
+            logger.warning(f"[Nicesuno] failed to run queued job, error={e}")
+            reply = Reply(ReplyType.TEXT, "抱歉！创作失败了，请稍后再试🥺")
+        if reply:
+            self._send(channel, reply, context)
+
+    # 登记音乐任务，由统一轮询服务等待音乐、封面和视频就绪
+    def _handle_music(self, channel, context, suno_api_base, aids: List, cache_key=None, suno_prompt=""):
+        job = MusicJob(channel, context, suno_api_base, aids, self.is_send_covers, cache_key)
+        if self.job_journal:
+            self.job_journal.add_job(job.job_id, "music", suno_api_base, aids, suno_prompt, self._dump_context(context), cache_key)
+        self._watch_music(job)
+
+    # 等待音乐任务中尚未处理的音乐、封面和视频
+    def _watch_music(self, job: MusicJob):
+        for aid in job.aids:
+            clip = job.clips[aid]
+            fields = []
+            if self.is_send_stream_url and not clip.audio_done and not clip.stream_url:
+                fields.append("stream_url")
+            if not clip.audio_done:
+                fields.append("audio_url")
+            if self.is_send_covers and not clip.cover_done:
+                fields.append("image_url")
+            if clip.video_url is None:
+                fields.append("video_url")
+            if fields:
+                self.feed_poller.watch_clip(job.suno_api_base, aid, fields, functools.partial(self._on_clip_ready, job))
+        self._finish_music(job)
+
+    # 记录任务状态变化
+    def _journal(self, job_id, state, clip_id=None, data=None):
+        if self.job_journal and job_id:
+            self.job_journal.record(job_id, state, clip_id, data)
+
+    # 音乐信息字段就绪或超时（在轮询线程中执行，转交给发送线程处理）
+    def _on_clip_ready(self, job: MusicJob, aid, field, data):
+        if data:
+            self.metrics.observe("clip_ready_seconds", time.time() - job.created_at, field=field)
+        else:
+            self.metrics.inc("clip_timeouts_total", field=field)
+        if field == "audio_url":
+            job.clips[aid].audio_ready_at = time.time()
+            if data:
+                self._journal(job.job_id, "audio_ready", aid)
+        self.delivery_executor.submit(self._deliver_clip, job, aid, field, data)
+
+    # 下载和发送音乐、封面，记录视频地址
+    def _deliver_clip(self, job: MusicJob, aid, field, data):
+        try:
+            if field == "stream_url":
+                self._deliver_stream(job, aid, data)
+            elif field == "audio_url":
+                self._deliver_audio(job, aid, data)
+            elif field == "image_url":
+                self._deliver_cover(job, aid, data)
+            elif field == "video_url":
+                with job.lock:
+                    job.clips[aid].video_url = data["video_url"] if data else "获取超时！"
+                self._journal(job.job_id, "video_ready", aid, {"video_url": job.clips[aid].video_url})
                 if not data:
-                    raise Exception("[Nicesuno] 获取音乐信息失败！")
-                elif data["audio_url"]:
-                    break
-                elif time.time() - start_time > 180:
-                    raise TimeoutError("[Nicesuno] 获取音乐信息超时！")
-                time.sleep(5)
-            # 解析音乐信息
-            title, metadata, audio_url = data["title"], data["metadata"], data["audio_url"]
-            lyrics, tags, description_prompt = metadata["prompt"], metadata["tags"], metadata['gpt_description_prompt']
-            description_prompt = description_prompt if description_prompt else "自定义模式不展示"
-            # 发送歌词
-            if not self.is_send_lyrics:
-                logger.debug(f"[Nicesuno] 发送歌词开关关闭，不发送歌词！")
-            elif lyrics == last_lyrics:
-                logger.debug("[Nicesuno] 歌词和上次相同，不再重复发送歌词！")
-            else:
-                reply_text = f"🎻{title}🎻\n\n{lyrics}\n\n🎹风格: {tags}\n👶发起人：{actual_user_nickname}\n🍀制作人：Suno\n🎤提示词: {description_prompt}"
-                logger.debug(f"[Nicesuno] 发送歌词，reply_text={reply_text}")
-                last_lyrics = lyrics
-                reply = Reply(ReplyType.TEXT, reply_text)
-                channel.send(reply, context)
-            # 下载音乐
-            filename = f"{int(time.time())}-{sanitize_filename(title).replace(' ', '')[:20]}"
-            audio_path = os.path.join(self.music_output_dir, f"{filename}.mp3")
-            logger.debug(f"[Nicesuno] 下载音乐，audio_url={audio_url}")
+                    logger.warning("[Nicesuno] 获取视频地址超时！")
+        except Exception as e:
+            logger.error(f"[Nicesuno] 发送音乐失败，aid={aid}, field={field}, error={e}")
+            with job.lock:
+                clip = job.clips[aid]
+                if field == "audio_url":
+                    clip.audio_done = True
+                elif field == "image_url":
+                    clip.cover_done = True
+            if field in ("audio_url", "image_url"):
+                self._journal(job.job_id, "audio_failed" if field == "audio_url" else "cover_failed", aid)
+        self._finish_music(job)
+
+    # 音乐开始流式生成时，先发送歌词和试听链接，完整的音乐文件生成后再发送
+    def _deliver_stream(self, job: MusicJob, aid, data):
+        clip = job.clips[aid]
+        if not data:
+            logger.warning(f"[Nicesuno] 获取试听链接超时！aid={aid}")
+            return
+        # 音乐已经生成完成时直接等待发送音乐文件
+        if data.get("status") == "complete":
+            return
+        stream_url = data["audio_url"]
+        with job.lock:
+            if clip.audio_done or clip.stream_url:
+                return
+            clip.stream_url = stream_url
+        title = self._send_clip_lyrics(job, clip, data)
+        reply = Reply(ReplyType.TEXT, f"🎧《{title}》已经可以试听啦：\n{stream_url}\n完整的音乐文件生成后马上发送~")
+        self._send(job.channel, reply, job.context)
+        self._journal(job.job_id, "stream_sent", aid, {"stream_url": stream_url})
+        logger.info(f"[Nicesuno] 试听链接已发送，aid={aid}, first_playable_seconds={time.time() - job.created_at:.2f}")
+
+    # 发送歌词和音乐
+    def _deliver_audio(self, job: MusicJob, aid, data):
+        channel, context, clip = job.channel, job.context, job.clips[aid]
+        if not data:
+            logger.warning(f"[Nicesuno] 获取音乐信息超时！aid={aid}")
+            self.feed_poller.unwatch_clip(aid)
+            with job.lock:
+                clip.audio_done, clip.cover_done, clip.video_url = True, True, "获取失败！"
+            self._journal(job.job_id, "audio_failed", aid)
+            return
+        # 已发送试听链接时，歌词也已发送
+        title, audio_url = self._send_clip_lyrics(job, clip, data, send=not clip.stream_url), data["audio_url"]
+        # 下载音乐，多首音乐在各自的发送线程中并行下载，文件名加上aid的前缀避免冲突
+        filename = f"{int(time.time())}-{sanitize_filename(title).replace(' ', '')[:20]}-{aid[:8]}"
+        audio_path = os.path.join(self.music_output_dir, f"{filename}.mp3")
+        logger.debug(f"[Nicesuno] 下载音乐，audio_url={audio_url}")
+        download_start = time.time()
+        # 下载和发送期间pin住文件，避免被存储管理删除
+        self.storage.pin(audio_path)
+        try:
             self._download_file(audio_url, audio_path)
+            self.storage.add(audio_path)
+            clip.audio_url, clip.audio_path = audio_url, audio_path
+            download_seconds = time.time() - download_start
+            self.metrics.observe("download_seconds", download_seconds)
+            self._journal(job.job_id, "downloaded", aid, {"audio_path": audio_path})
             # 发送音乐
             logger.debug(f"[Nicesuno] 发送音乐，audio_path={audio_path}")
             reply = Reply(ReplyType.FILE, audio_path)
-            channel.send(reply, context)
-            # 发送封面
-            if not self.is_send_covers:
-                logger.debug(f"[Nicesuno] 发送封面开关关闭，不发送封面！")
-            else:
-                # 获取封面信息
-                start_time = time.time()
-                while True:
-                    data = self._suno_get_music(aid)
-                    if not data:
-                        #raise Exception("[Nicesuno] 获取封面信息失败！")
-                        logger.warning("[Nicesuno] 获取封面信息失败！")
-                        break
-                    elif data["image_url"]:
-                        break
-                    elif time.time() - start_time > 60:
-                        #raise TimeoutError("[Nicesuno] 获取封面信息超时！")
-                        logger.warning("[Nicesuno] 获取封面信息超时！")
-                        break
-                    time.sleep(5)
-                if data and data["image_url"]:
-                    image_url = data["image_url"]
-                    logger.debug(f"[Nicesuno] 发送封面，image_url={image_url}")
-                    reply = Reply(ReplyType.IMAGE_URL, image_url)
-                    channel.send(reply, context)
-                else:
-                    logger.warning(f"[Nicesuno] 获取封面信息失败，放弃发送封面！")
-        # 获取视频地址
-        video_urls = []
-        for aid in aids:
-            # 获取视频地址
-            start_time = time.time()
-            while True:
-                data = self._suno_get_music(aid)
-                if not data:
-                    #raise Exception("[Nicesuno] 获取视频地址失败！")
-                    logger.warning("[Nicesuno] 获取视频地址失败！")
-                    video_urls.append("获取失败！")
-                    break
-                elif data["video_url"]:
-                    video_urls.append(data["video_url"])
-                    break
-                elif time.time() - start_time > 180:
-                    #raise TimeoutError("[Nicesuno] 获取视频地址超时！")
-                    logger.warning("[Nicesuno] 获取视频地址超时！")
-                    video_urls.append("获取超时！")
-                time.sleep(10)
-        # 查收提醒
+            self._send(channel, reply, context)
+        finally:
+            self.storage.unpin(audio_path)
+        self._journal(job.job_id, "audio_sent", aid, clip.result())
+        ready_to_sent_seconds = time.time() - (clip.audio_ready_at or download_start)
+        self.metrics.observe("ready_to_sent_seconds", ready_to_sent_seconds)
+        logger.info(f"[Nicesuno] 音乐已发送，aid={aid}, download_seconds={download_seconds:.2f}, ready_to_sent_seconds={ready_to_sent_seconds:.2f}")
+        # 音乐发送之前已经获取到的封面，此时补发
+        with job.lock:
+            clip.audio_done, clip.audio_sent = True, True
+            image_url = clip.image_url if not clip.cover_done else None
+        if image_url:
+            self._send_cover(job, clip, image_url)
+
+    # 解析音乐信息并发送歌词，与同一任务上一次发送的歌词相同时不再重复发送，返回音乐标题
+    def _send_clip_lyrics(self, job: MusicJob, clip, data, send=True):
+        context = job.context
+        # 用户信息
+        actual_user_nickname = context["msg"].actual_user_nickname or context["msg"].other_user_nickname
+        # 解析音乐信息
+        title, metadata = data["title"], data["metadata"]
+        lyrics, tags, description_prompt = metadata["prompt"], metadata["tags"], metadata['gpt_description_prompt']
+        description_prompt = description_prompt if description_prompt else "自定义模式不展示"
+        clip.title, clip.lyrics, clip.tags, clip.description_prompt = title, lyrics, tags, description_prompt
+        if not send:
+            return title
+        # 发送歌词
+        with job.lock:
+            is_same_lyrics = lyrics == job.last_lyrics
+            job.last_lyrics = lyrics
+        if not self.is_send_lyrics:
+            logger.debug(f"[Nicesuno] 发送歌词开关关闭，不发送歌词！")
+        elif is_same_lyrics:
+            logger.debug("[Nicesuno] 歌词和上次相同，不再重复发送歌词！")
+        else:
+            self._send_music_lyrics(job.channel, context, title, lyrics, tags, actual_user_nickname, description_prompt)
+        return title
+
+    # 发送封面，音乐尚未发送时先记录封面地址
+    def _deliver_cover(self, job: MusicJob, aid, data):
+        clip = job.clips[aid]
+        if not data:
+            logger.warning(f"[Nicesuno] 获取封面信息失败，放弃发送封面！")
+            with job.lock:
+                clip.cover_done = True
+            self._journal(job.job_id, "cover_failed", aid)
+            return
+        with job.lock:
+            clip.image_url = data["image_url"]
+            if not clip.audio_sent:
+                return
+        self._send_cover(job, clip, data["image_url"])
+
+    def _send_cover(self, job: MusicJob, clip, image_url):
+        with job.lock:
+            if clip.cover_done:
+                return
+            clip.cover_done = True
+        logger.debug(f"[Nicesuno] 发送封面，image_url={image_url}")
+        reply = Reply(ReplyType.IMAGE_URL, image_url)
+        self._send(job.channel, reply, job.context)
+        self._journal(job.job_id, "cover_sent", clip.aid, {"image_url": image_url})
+
+    # 全部处理完毕后发送查收提醒
+    def _finish_music(self, job: MusicJob):
+        with job.lock:
+            if job.finished or not job.is_complete():
+                return
+            job.finished = True
+            video_urls = [job.clips[aid].video_url for aid in job.aids]
+            results = job.results()
+        self.backend_pool.release(job.suno_api_base)
+        self.job_scheduler.record_duration(time.time() - job.created_at)
+        self.metrics.observe("job_seconds", time.time() - job.created_at)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"[Nicesuno] http connection stats={self.http_sessions.stats()}")
+        self._send_music_reminder(job.channel, job.context, video_urls)
+        self._journal(job.job_id, "video_sent")
+        self._finish_cached_music(job.cache_key, clips=results)
+        self._journal(job.job_id, "done")
+
+    # 通过channel发送消息，并记录发送耗时
+    def _send(self, channel, reply, context):
+        send_start = time.time()
+        channel.send(reply, context)
+        self.metrics.observe("send_seconds", time.time() - send_start, type=reply.type.name)
+
+    # 发送音乐的歌词
+    def _send_music_lyrics(self, channel, context, title, lyrics, tags, actual_user_nickname, description_prompt):
+        reply_text = f"🎻{title}🎻\n\n{lyrics}\n\n🎹风格: {tags}\n👶发起人：{actual_user_nickname}\n🍀制作人：Suno\n🎤提示词: {description_prompt}"
+        logger.debug(f"[Nicesuno] 发送歌词，reply_text={reply_text}")
+        reply = Reply(ReplyType.TEXT, reply_text)
+        self._send(channel, reply, context)
+
+    # 发送查收提醒
+    def _send_music_reminder(self, channel, context, video_urls: List):
+        actual_user_nickname = context["msg"].actual_user_nickname or context["msg"].other_user_nickname
+        to_user_nickname = context["msg"].to_user_nickname
         video_text = '\n'.join(f'视频{idx+1}: {url}' for idx, url in zip(range(len(video_urls)), video_urls))
         reply_text = f"{to_user_nickname}已经为您创作了音乐，请查收！以下是音乐视频：\n{video_text}"
         if context.get("isgroup", False):
             reply_text = f"@{actual_user_nickname}\n" + reply_text
         logger.debug(f"[Nicesuno] 发送查收提醒，reply_text={reply_text}")
         reply = Reply(ReplyType.TEXT, reply_text)
-        channel.send(reply, context)
+        self._send(channel, reply, context)
+
+    # 相同任务结束后通知等待者：创作成功时写入缓存并重放创作结果，失败时发送同样的错误提示
+    def _finish_cached_music(self, cache_key, clips=None, reply=None):
+        if not cache_key:
+            return
+        for channel, context in self.result_cache.finish(cache_key, clips):
+            if clips:
+                self.delivery_executor.submit(self._replay_music, channel, context, clips)
+            else:
+                self._send(channel, reply or Reply(ReplyType.TEXT, f"因为神秘原因，创作失败了😂请稍后再试..."), context)
 
-    # 获取和发送歌词
-    def _handle_lyric(self, channel, context, lid, description_prompt=""):
+    # 重放缓存的创作结果，本地音乐文件已被删除时重新下载
+    def _replay_music(self, channel, context, clips: List):
+        try:
+            actual_user_nickname = context["msg"].actual_user_nickname or context["msg"].other_user_nickname
+            last_lyrics = ""
+            for clip in clips:
+                if self.is_send_lyrics and clip["lyrics"] != last_lyrics:
+                    self._send_music_lyrics(channel, context, clip["title"], clip["lyrics"], clip["tags"],
+                                            actual_user_nickname, clip["description_prompt"])
+                last_lyrics = clip["lyrics"]
+                self.storage.pin(clip["audio_path"])
+                try:
+                    # 同一缓存结果可能被同时重放，只由一个线程重新下载
+                    with self.storage.locked(clip["audio_path"]):
+                        if not os.path.exists(clip["audio_path"]):
+                            logger.debug(f"[Nicesuno] 缓存的音乐文件不存在，重新下载，audio_path={clip['audio_path']}")
+                            self._download_file(clip["audio_url"], clip["audio_path"])
+                    self.storage.add(clip["audio_path"])
+                    self._send(channel, Reply(ReplyType.FILE, clip["audio_path"]), context)
+                finally:
+                    self.storage.unpin(clip["audio_path"])
+                if self.is_send_covers and clip["image_url"]:
+                    self._send(channel, Reply(ReplyType.IMAGE_URL, clip["image_url"]), context)
+            self._send_music_reminder(channel, context, [clip["video_url"] for clip in clips])
+        except Exception as e:
+            logger.warning(f"[Nicesuno] failed to replay cached music, error={e}")
+            self._send(channel, Reply(ReplyType.TEXT, "抱歉！创作失败了，请稍后再试🥺"), context)
+
+    # 登记歌词任务，由统一轮询服务等待歌词创作完成
+    def _handle_lyric(self, channel, context, suno_api_base, lid, description_prompt=""):
+        if self.job_journal:
+            self.job_journal.add_job(lid, "lyrics", suno_api_base, [lid], description_prompt, self._dump_context(context))
+        self._watch_lyrics(channel, context, suno_api_base, lid, description_prompt)
+
+    # 等待歌词创作完成
+    def _watch_lyrics(self, channel, context, suno_api_base, lid, description_prompt):
+        callback = functools.partial(self._on_lyrics_ready, channel, context, suno_api_base, description_prompt)
+        self.feed_poller.watch_lyrics(suno_api_base, lid, callback)
+
+    # 歌词创作完成或超时（在轮询线程中执行，转交给发送线程处理）
+    def _on_lyrics_ready(self, channel, context, suno_api_base, description_prompt, lid, data):
+        self.backend_pool.release(suno_api_base)
+        if not data:
+            logger.warning(f"[Nicesuno] 获取歌词信息超时！lid={lid}")
+            self._journal(lid, "done")
+            return
+        self.delivery_executor.submit(self._send_lyrics, channel, context, description_prompt, data, lid)
+
+    # 发送歌词
+    def _send_lyrics(self, channel, context, description_prompt, data, lid=None):
         # 用户信息
         actual_user_nickname = context["msg"].actual_user_nickname or context["msg"].other_user_nickname
-        # 获取歌词信息
-        start_time = time.time()
-        while True:
-            data = self._suno_get_lyrics(lid)
-            if not data:
-                raise Exception("[Nicesuno] 获取歌词信息失败！")
-            elif data["status"] == 'complete':
-                break
-            elif time.time() - start_time > 120:
-                raise TimeoutError("[Nicesuno] 获取歌词信息超时！")
-            time.sleep(5)
-        # 发送歌词
         title, lyrics = data["title"], data["text"]
         reply_text = f"🎻{title}🎻\n\n{lyrics}\n\n👶发起人：{actual_user_nickname}\n🍀制作人：Suno\n🎤提示词: {description_prompt}"
         logger.debug(f"[Nicesuno] 发送歌词，reply_text={reply_text}")
         reply = Reply(ReplyType.TEXT, reply_text)
-        channel.send(reply, context)
+        self._send(channel, reply, context)
+        self._journal(lid, "done")
+
+    # 恢复插件重启前未完成的任务，直接交给轮询服务和发送线程，不会重新提交创作
+    # 启动时先清理超过保留时间的已结束任务，没有需要恢复的任务时也会清理
+    def _resume_jobs(self):
+        try:
+            self.job_journal.prune(self.job_journal_keep_seconds)
+        except Exception as e:
+            logger.warning(f"[Nicesuno] failed to prune job journal, error={e}")
+        jobs = self.job_journal.unfinished_jobs(self.job_resume_max_age_seconds)
+        if not jobs:
+            return
+        channel = self._create_channel()
+        if not channel:
+            return
+        for data in jobs:
+            try:
+                context = self._load_context(data["context"])
+                self.backend_pool.occupy(data["suno_api_base"])
+                if data["kind"] == "lyrics":
+                    self._watch_lyrics(channel, context, data["suno_api_base"], data["ids"][0], data["prompt"])
+                else:
+                    job = MusicJob(channel, context, data["suno_api_base"], data["ids"], self.is_send_covers,
+                                   data["cache_key"], data["job_id"])
+                    job.restore(data["events"])
+                    self._watch_music(job)
+                logger.info(f"[Nicesuno] job resumed, job_id={data['job_id']}, kind={data['kind']}, state={data['state']}")
+            except Exception as e:
+                logger.warning(f"[Nicesuno] failed to resume job, job_id={data['job_id']}, error={e}")
+
+    # 获取当前运行的消息通道，用于发送恢复的任务
+    def _create_channel(self):
+        try:
+            from channel import channel_factory
+            from config import conf
+            return channel_factory.create_channel(conf().get("channel_type", "wx"))
+        except Exception as e:
+            logger.warning(f"[Nicesuno] failed to create channel, unfinished jobs are not resumed, error={e}")
+            return None
+
+    # 序列化发送音乐所需的消息上下文
+    def _dump_context(self, context):
+        msg = context["msg"]
+        return {
+            "content": context.content,
+            "isgroup": context.get("isgroup", False),
+            "receiver": context.get("receiver"),
+            "session_id": context.get("session_id"),
+            "msg": {attr: getattr(msg, attr, None) for attr in CONTEXT_MSG_ATTRS},
+        }
+
+    # 根据序列化的数据恢复消息上下文
+    def _load_context(self, data):
+        kwargs = {
+            "isgroup": data["isgroup"],
+            "receiver": data["receiver"],
+            "session_id": data["session_id"],
+            "msg": SimpleNamespace(**data["msg"]),
+        }
+        return Context(ContextType.TEXT, data["content"], kwargs)
+
+    # 依次在可用的Suno-API上提交创作任务，遇到限额、失效或繁忙时下线该后端并切换到下一个
+    # 请求失败（data为空）时不切换，避免任务其实已经提交而重复消耗额度
+    # backend为调用方已占用名额的后端；任务创建成功时保留名额，由任务结束时释放
+    # deadline为等待名额的截止时间，切换后端时其他后端名额已满的话最多等到该时间；ignore_limit为True时不受名额上限限制
+    def _suno_generate(self, generate_func, *args, backend=None, deadline=0, ignore_limit=False):
+        data, tried = None, []
+        # 创作歌词不消耗额度，额度用完的后端仍可使用
+        usable_reasons = ('Insufficient credits.',) if generate_func == self._suno_generate_lyrics else ()
+        while True:
+            backend = backend or self.backend_pool.acquire(exclude=tried, timeout=max(deadline - time.time(), 0),
+                                                           usable_reasons=usable_reasons, ignore_limit=ignore_limit)
+            if not backend:
+                return None, data or self.backend_pool.unavailable_data(usable_reasons)
+            tried.append(backend)
+            generate_start = time.time()
+            data = generate_func(backend.base, *args)
+            self.metrics.observe("generate_seconds", time.time() - generate_start, backend=backend.base)
+            self.metrics.inc("generate_total", backend=backend.base)
+            detail = data.get('detail') if isinstance(data, dict) else None
+            if not data or detail:
+                reason = GENERATE_ERROR_REASONS.get(detail, "other") if detail else "request_failed"
+                self.metrics.inc("generate_errors_total", backend=backend.base, reason=reason)
+                self.backend_pool.release(backend.base)
+            if detail and self.backend_pool.should_cooldown(detail):
+                self.backend_pool.cooldown(backend, detail)
+                backend = None
+                continue
+            return backend.base, data
 
     # 创作音乐
-    def _suno_generate_music_with_description(self, description, make_instrumental=False, retry_count=0):
+    def _suno_generate_music_with_description(self, suno_api_base, description, make_instrumental=False, retry_count=0):
+        if self.async_client:
+            return self._async_call(self.async_client.generate_music_with_description(suno_api_base, description, make_instrumental, retry_count))
         payload = {
             "gpt_description_prompt": description,
             "make_instrumental": make_instrumental,
@@ -312,10 +833,11 @@ class Nicesuno(Plugin):
         }
         while retry_count >= 0:
             try:
-                response = requests.post(f"{self.suno_api_base}/generate/description-mode", data=json.dumps(payload), timeout=(5, 30))
+                response = self.http_sessions.get(suno_api_base).post(f"{suno_api_base}/generate/description-mode", data=json.dumps(payload), timeout=(5, 30))
                 if response.status_code != 200:
                     raise Exception(f"status_code is not ok, status_code={response.status_code}")
-                logger.debug(f"[Nicesuno] _suno_generate_music_with_description, response={response.text}")
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(f"[Nicesuno] _suno_generate_music_with_description, response={response.text}")
                 return response.json()
             except Exception as e:
                 logger.error(f"[Nicesuno] _suno_generate_music_with_description failed, description={description}, error={e}")
@@ -323,7 +845,9 @@ class Nicesuno(Plugin):
                 time.sleep(5)
 
     # 创作音乐
-    def _suno_generate_music_custom_mode(self, title=None, tags=None, lyrics=None, make_instrumental=False, retry_count=0):
+    def _suno_generate_music_custom_mode(self, suno_api_base, title=None, tags=None, lyrics=None, make_instrumental=False, retry_count=0):
+        if self.async_client:
+            return self._async_call(self.async_client.generate_music_custom_mode(suno_api_base, title, tags, lyrics, make_instrumental, retry_count))
         payload = {
             "title": title,
             "tags": tags,
@@ -335,41 +859,61 @@ class Nicesuno(Plugin):
         }
         while retry_count >= 0:
             try:
-                response = requests.post(f"{self.suno_api_base}/generate", data=json.dumps(payload), timeout=(5, 30))
+                response = self.http_sessions.get(suno_api_base).post(f"{suno_api_base}/generate", data=json.dumps(payload), timeout=(5, 30))
                 if response.status_code != 200:
                     raise Exception(f"status_code is not ok, status_code={response.status_code}")
-                logger.debug(f"[Nicesuno] _suno_generate_music_custom_mode, response={response.text}")
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(f"[Nicesuno] _suno_generate_music_custom_mode, response={response.text}")
                 return response.json()
             except Exception as e:
                 logger.error(f"[Nicesuno] _suno_generate_music_custom_mode failed, title={title}, tags={tags}, lyrics={lyrics}, error={e}")
                 retry_count -= 1
                 time.sleep(5)
 
-    # 获取音乐信息
-    def _suno_get_music(self, aid, retry_count=3):
+    # 批量获取音乐信息，Suno-API支持以逗号分隔的多个aid
+    def _suno_get_feed(self, suno_api_base, aids: List, retry_count=0):
+        if self.async_client:
+            return self._async_call(self.async_client.get_feed(suno_api_base, aids, retry_count))
         while retry_count >= 0:
             try:
-                response = requests.get(f"{self.suno_api_base}/feed/{aid}", timeout=(5, 30))
+                response = self.http_sessions.get(suno_api_base).get(f"{suno_api_base}/feed/{','.join(aids)}", timeout=(5, 30))
                 if response.status_code != 200:
                     raise Exception(f"status_code is not ok, status_code={response.status_code}")
-                logger.debug(f"[Nicesuno] _suno_get_music, response={response.text}")
-                return response.json()[0]
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(f"[Nicesuno] _suno_get_feed, response={response.text}")
+                return response.json()
             except Exception as e:
-                logger.error(f"[Nicesuno] _suno_get_music failed, aid={aid}, error={e}")
+                logger.error(f"[Nicesuno] _suno_get_feed failed, aids={aids}, error={e}")
                 retry_count -= 1
-                time.sleep(5)
+                if retry_count >= 0:
+                    time.sleep(5)
+
+    # 并发获取多个Suno-API的音乐信息，仅在开启suno_async_engine时由轮询服务使用
+    def _suno_get_feeds(self, requests: List, retry_count=0):
+        results = self._async_call(self.async_client.get_feeds(requests, retry_count))
+        return results if results is not None else [None] * len(requests)
+
+    # asyncio引擎下等待协程结果，超时或出错时与同步实现一样返回None
+    def _async_call(self, coro):
+        try:
+            return self.async_client.call(coro)
+        except Exception as e:
+            logger.error(f"[Nicesuno] async call failed, error={e}")
 
     # 创作歌词
-    def _suno_generate_lyrics(self, suno_lyric_prompt, retry_count=3):
+    def _suno_generate_lyrics(self, suno_api_base, suno_lyric_prompt, retry_count=3):
+        if self.async_client:
+            return self._async_call(self.async_client.generate_lyrics(suno_api_base, suno_lyric_prompt, retry_count))
         payload = {
             "prompt": suno_lyric_prompt
         }
         while retry_count >= 0:
             try:
-                response = requests.post(f"{self.suno_api_base}/generate/lyrics/", data=json.dumps(payload), timeout=(5, 30))
+                response = self.http_sessions.get(suno_api_base).post(f"{suno_api_base}/generate/lyrics/", data=json.dumps(payload), timeout=(5, 30))
                 if response.status_code != 200:
                     raise Exception(f"status_code is not ok, status_code={response.status_code}")
-                logger.debug(f"[Nicesuno] _suno_generate_lyrics, response={response.text}")
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(f"[Nicesuno] _suno_generate_lyrics, response={response.text}")
                 return response.json()
             except Exception as e:
                 logger.error(f"[Nicesuno] _suno_generate_lyrics failed, suno_lyric_prompt={suno_lyric_prompt}, error={e}")
@@ -377,44 +921,86 @@ class Nicesuno(Plugin):
                 time.sleep(5)
 
     # 获取歌词信息
-    def _suno_get_lyrics(self, lid, retry_count=3):
+    def _suno_get_lyrics(self, suno_api_base, lid, retry_count=3):
+        if self.async_client:
+            return self._async_call(self.async_client.get_lyrics(suno_api_base, lid, retry_count))
         while retry_count >= 0:
             try:
-                response = requests.get(f"{self.suno_api_base}/lyrics/{lid}", timeout=(5, 30))
+                response = self.http_sessions.get(suno_api_base).get(f"{suno_api_base}/lyrics/{lid}", timeout=(5, 30))
                 if response.status_code != 200:
                     raise Exception(f"status_code is not ok, status_code={response.status_code}")
-                logger.debug(f"[Nicesuno] _suno_get_lyrics, response={response.text}")
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(f"[Nicesuno] _suno_get_lyrics, response={response.text}")
                 return response.json()
             except Exception as e:
                 logger.error(f"[Nicesuno] _suno_get_lyrics failed, lid={lid}, error={e}")
                 retry_count -= 1
-                time.sleep(5)
+                if retry_count >= 0:
+                    time.sleep(5)
 
-    # 下载文件
+    # 下载文件：先写入临时文件，完成后原子重命名为目标文件；重试时通过Range请求续传已下载的部分
     def _download_file(self, file_url, file_path, retry_count=3):
+        if self.async_client:
+            # 下载较大的文件可能耗时较长，按重试次数放宽等待时间
+            return self.async_client.call(self.async_client.download_file(file_url, file_path, retry_count),
+                                          self.async_client.call_timeout * (retry_count + 1))
+        temp_path = f"{file_path}.part"
         while retry_count >= 0:
             try:
-                response = requests.get(file_url, allow_redirects=True, stream=True)
-                if response.status_code != 200:
-                    raise Exception(f"[Nicesuno] 文件下载失败，file_url={file_url}, status_code={response.status_code}")
-                with open(file_path, "wb") as f:
-                    for chunk in response.iter_content(chunk_size=1024):
-                        if chunk:
-                            f.write(chunk)
+                downloaded = os.path.getsize(temp_path) if os.path.exists(temp_path) else 0
+                headers = {"Range": f"bytes={downloaded}-"} if downloaded else {}
+                with self.http_sessions.get("cdn").get(file_url, headers=headers, allow_redirects=True, stream=True,
+                                                       timeout=(5, 60)) as response:
+                    # 206表示服务端支持续传，200表示需要从头下载
+                    if response.status_code == 206:
+                        mode = "ab"
+                    elif response.status_code == 200:
+                        mode = "wb"
+                    else:
+                        if response.status_code == 416 and os.path.exists(temp_path):
+                            os.remove(temp_path)
+                        raise Exception(f"[Nicesuno] 文件下载失败，file_url={file_url}, status_code={response.status_code}")
+                    with open(temp_path, mode) as f:
+                        for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                            if chunk:
+                                f.write(chunk)
+                os.replace(temp_path, file_path)
+                return
             except Exception as e:
                 logger.error(f"[Nicesuno] 文件下载失败，file_url={file_url}, error={e}")
                 retry_count -= 1
-                time.sleep(5)
-            else:
-                break
+                if retry_count >= 0:
+                    time.sleep(5)
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise Exception(f"[Nicesuno] 文件下载失败，已达到最大重试次数，file_url={file_url}")
+
     # 检查是否包含创作音乐的前缀
-    def _check_prefix(self, content, prefix_list):
-        if not prefix_list:
-            return None
-        for prefix in prefix_list:
-            if content.startswith(prefix):
-                return prefix
-        return None
+    # 把指令和各类创作前缀编译为一个锚定在开头的正则，分组顺序即判断顺序：指令、声乐、器乐、歌词，
+    # 同一分组内按配置顺序匹配；同时返回所有前缀的首字符集合，用于快速忽略无关消息
+    def _compile_prefixes(self):
+        alternatives = [rf"(?P<stats>{re.escape(self.stats_command)})\s*$"]
+        first_chars = {self.stats_command[:1]}
+        for mode, prefixes in (("music", self.music_create_prefixes),
+                               ("instrumental", self.instrumental_create_prefixes),
+                               ("lyrics", self.lyrics_create_prefixes)):
+            if not prefixes or not isinstance(prefixes, List):
+                continue
+            alternatives.append(f"(?P<{mode}>{'|'.join(re.escape(prefix) for prefix in prefixes)})")
+            first_chars.update(prefix[:1] for prefix in prefixes)
+        # 空前缀匹配所有消息，无法按首字符过滤
+        if "" in first_chars:
+            first_chars = None
+        return re.compile("|".join(alternatives)), first_chars
+
+    # 返回(创作类型或stats, 提示词)，不匹配时返回(None, None)
+    def _match_prefix(self, content):
+        if self.prefix_first_chars is not None and content[:1] not in self.prefix_first_chars:
+            return None, None
+        match = self.prefix_pattern.match(content)
+        if not match:
+            return None, None
+        return match.lastgroup, content[match.end():].strip()
 
     # 帮助文档
     def get_help_text(self, **kwargs):
@@ -0,0 +1,57 @@
+# encoding:utf-8
+import random
+import threading
+from collections import deque
+
+# 没有足够历史数据时，各类任务预计就绪的时间窗口（秒，从开始轮询算起）
+DEFAULT_READY_WINDOWS = {
+    "stream_url": (10, 60),
+    "audio_url": (30, 120),
+    "image_url": (30, 130),
+    "video_url": (60, 240),
+    "lyrics": (3, 20),
+}
+# 计算就绪时间窗口所需的最少样本数
+MIN_SAMPLES = 5
+
+
+# 自适应轮询策略：根据最近任务的就绪耗时，在预计就绪的时间窗口内密集轮询，窗口之前直接等待，窗口之后逐渐退避，并加入随机抖动
+class PollingPolicy:
+    def __init__(self, min_interval=2, max_interval=20, jitter=0.2, window=50, backoff_ratio=0.5):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.jitter = jitter
+        self.backoff_ratio = backoff_ratio
+        self.window = window
+        self._samples = {kind: deque(maxlen=window) for kind in DEFAULT_READY_WINDOWS}
+        self._lock = threading.Lock()
+
+    # 记录一次就绪耗时，kind为音乐信息字段名或lyrics
+    def record(self, kind, seconds):
+        with self._lock:
+            self._samples.setdefault(kind, deque(maxlen=self.window)).append(seconds)
+
+    # 预计就绪的时间窗口，取最近样本的10%和90%分位数
+    def ready_window(self, kind):
+        with self._lock:
+            samples = sorted(self._samples.get(kind, ()))
+        if len(samples) < MIN_SAMPLES:
+            return DEFAULT_READY_WINDOWS.get(kind, DEFAULT_READY_WINDOWS["video_url"])
+        return samples[int(len(samples) * 0.1)], samples[min(int(len(samples) * 0.9), len(samples) - 1)]
+
+    # 已等待elapsed秒，仍在等待kinds中的字段时，距下次轮询的间隔
+    def next_delay(self, kinds, elapsed):
+        delay = min(self._delay(kind, elapsed) for kind in kinds) if kinds else self.max_interval
+        delay *= random.uniform(1 - self.jitter, 1 + self.jitter)
+        return max(delay, self.min_interval / 2)
+
+    def _delay(self, kind, elapsed):
+        start, end = self.ready_window(kind)
+        # 窗口之前：直接等到窗口开始
+        if elapsed < start - self.min_interval:
+            return start - elapsed
+        # 窗口之内：以最小间隔密集轮询
+        if elapsed <= end:
+            return self.min_interval
+        # 窗口之后：间隔随超出时间线性增长，直至最大间隔
+        return min(self.min_interval + (elapsed - end) * self.backoff_ratio, self.max_interval)
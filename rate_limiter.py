@@ -0,0 +1,76 @@
+# encoding:utf-8
+import time
+import threading
+
+# 限流维度：每个用户、每个群、全局
+RATE_LIMIT_SCOPES = ("user", "group", "global")
+
+
+# 令牌桶限流：每个桶只保存[剩余令牌数, 上次更新时间]，按capacity/period_seconds的速率补充令牌；
+# 长时间未使用、令牌已补满的桶与新建的桶等价，定期删除以控制内存占用
+class RateLimiter:
+    def __init__(self, limits=None, cleanup_interval=600):
+        # limits: {scope: {"capacity": 令牌桶容量, "period_seconds": 补满令牌所需秒数}}，未配置的维度不限流
+        self.limits = {}
+        for scope, limit in (limits or {}).items():
+            if scope in RATE_LIMIT_SCOPES and limit and limit.get("capacity") and limit.get("period_seconds"):
+                capacity = limit["capacity"]
+                self.limits[scope] = (capacity, capacity / limit["period_seconds"])
+        self.cleanup_interval = cleanup_interval
+        self._buckets = {}
+        self._last_cleanup = time.time()
+        self._lock = threading.Lock()
+
+    # 是否配置了任意维度的限流
+    def enabled(self):
+        return bool(self.limits)
+
+    # 尝试从keys对应的各个桶中同时取出cost个令牌：全部足够时扣除并返回0，否则不扣除，返回需要等待的秒数
+    # keys: {scope: key}，key为None的维度跳过，例如私聊没有群
+    def acquire(self, keys, cost=1):
+        now = time.time()
+        with self._lock:
+            if now - self._last_cleanup > self.cleanup_interval:
+                self._cleanup(now)
+            buckets, wait_seconds = [], 0
+            for scope, key in keys.items():
+                if key is None or scope not in self.limits:
+                    continue
+                capacity, rate = self.limits[scope]
+                bucket_key = (scope, key)
+                bucket = self._buckets.get(bucket_key)
+                if bucket is None:
+                    bucket = self._buckets[bucket_key] = [capacity, now]
+                else:
+                    bucket[0] = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+                    bucket[1] = now
+                if bucket[0] < cost:
+                    wait_seconds = max(wait_seconds, (cost - bucket[0]) / rate)
+                buckets.append(bucket)
+            if wait_seconds:
+                return wait_seconds
+            for bucket in buckets:
+                bucket[0] -= cost
+            return 0
+
+    # 退还acquire取出的令牌，用于请求最终没有提交创作的情况，令牌数不超过桶容量
+    def refund(self, keys, cost=1):
+        with self._lock:
+            for scope, key in keys.items():
+                bucket = self._buckets.get((scope, key))
+                if key is None or scope not in self.limits or bucket is None:
+                    continue
+                bucket[0] = min(self.limits[scope][0], bucket[0] + cost)
+
+    # 当前桶的数量
+    def bucket_count(self):
+        with self._lock:
+            return len(self._buckets)
+
+    # 调用方需持有_lock
+    def _cleanup(self, now):
+        self._last_cleanup = now
+        for bucket_key, (tokens, updated_at) in list(self._buckets.items()):
+            capacity, rate = self.limits[bucket_key[0]]
+            if tokens + (now - updated_at) * rate >= capacity:
+                del self._buckets[bucket_key]
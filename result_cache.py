@@ -0,0 +1,91 @@
+# encoding:utf-8
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+from common.log import logger
+
+
+# 创作结果缓存：相同的提示词直接重放已创作的音乐，不再消耗Suno额度；
+# 相同的任务正在创作时，新的请求登记为等待者，待创作完成后一并发送（single-flight）
+class ResultCache:
+    def __init__(self, ttl_seconds=86400, max_entries=100, path=None):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.path = path
+        self._entries = OrderedDict()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        if self.path:
+            self._load()
+
+    # 根据创作参数生成缓存键，文本参数忽略首尾空白、连续空白和大小写
+    @staticmethod
+    def make_key(*parts):
+        normalized = [re.sub(r"\s+", " ", part.strip()).lower() if isinstance(part, str) else part for part in parts]
+        return hashlib.sha1(json.dumps(normalized, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    # 获取未过期的缓存结果
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if not entry:
+                return None
+            if time.time() - entry["created_at"] > self.ttl_seconds:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    # 相同的任务正在创作时登记waiter并返回False；否则标记为正在创作并返回True，由调用方提交创作
+    def begin(self, key, waiter):
+        with self._lock:
+            if key in self._in_flight:
+                self._in_flight[key].append(waiter)
+                return False
+            self._in_flight[key] = []
+            return True
+
+    # 创作结束，clips不为空时写入缓存；返回等待该结果的waiter
+    def finish(self, key, clips=None):
+        with self._lock:
+            waiters = self._in_flight.pop(key, [])
+            if clips:
+                self._entries[key] = {"created_at": time.time(), "clips": clips}
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                self._save()
+        return waiters
+
+    def _load(self):
+        try:
+            if not os.path.exists(self.path):
+                return
+            with open(self.path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+            now = time.time()
+            for key, entry in sorted(entries.items(), key=lambda item: item[1]["created_at"]):
+                if now - entry["created_at"] <= self.ttl_seconds:
+                    self._entries[key] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            logger.info(f"[Nicesuno] result cache loaded, entries={len(self._entries)}")
+        except Exception as e:
+            logger.warning(f"[Nicesuno] failed to load result cache, path={self.path}, error={e}")
+
+    # 调用方需持有_lock
+    def _save(self):
+        if not self.path:
+            return
+        try:
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(self._entries, f, ensure_ascii=False)
+            os.replace(temp_path, self.path)
+        except Exception as e:
+            logger.warning(f"[Nicesuno] failed to save result cache, path={self.path}, error={e}")
@@ -0,0 +1,147 @@
+# encoding:utf-8
+import os
+import re
+import time
+import threading
+import contextlib
+from collections import OrderedDict
+
+from common.log import logger
+
+# 插件下载的音乐文件名以{时间戳}-开头、以.mp3结尾，以及下载中的临时文件；目录中的其他文件不做管理
+MANAGED_FILE_PATTERN = re.compile(r"^\d{10}-.+\.mp3(\.part)?$")
+
+
+# 音乐文件存储管理：在内存中按最近使用顺序索引已下载的文件，由后台线程定期删除过期文件，
+# 并在超出容量上限时按LRU淘汰；等待发送的文件需pin住，不会被删除
+class StorageManager:
+    def __init__(self, root, max_bytes=0, max_age_seconds=0, sweep_interval=300):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.sweep_interval = sweep_interval
+        # path -> [size, last_used]，按last_used从旧到新排列
+        self._files = OrderedDict()
+        self._total_bytes = 0
+        self._pins = {}
+        # path -> [锁, 使用者数]，同一文件同时只允许一个线程下载
+        self._path_locks = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._scan()
+        if self.max_bytes or self.max_age_seconds:
+            self._thread = threading.Thread(target=self._run, name="nicesuno-storage", daemon=True)
+            self._thread.start()
+
+    # 启动时扫描一次目录，之后只维护内存中的索引
+    def _scan(self):
+        try:
+            entries = []
+            with os.scandir(self.root) as it:
+                for entry in it:
+                    if entry.is_file() and MANAGED_FILE_PATTERN.match(entry.name):
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime, entry.path, stat.st_size))
+            for mtime, path, size in sorted(entries):
+                self._files[path] = [size, mtime]
+                self._total_bytes += size
+            logger.info(f"[Nicesuno] storage indexed, files={len(self._files)}, bytes={self._total_bytes}")
+        except Exception as e:
+            logger.warning(f"[Nicesuno] failed to scan music_output_dir, root={self.root}, error={e}")
+
+    # 文件等待下载或发送期间不会被删除，pin和unpin需成对调用
+    def pin(self, path):
+        with self._lock:
+            self._pins[path] = self._pins.get(path, 0) + 1
+
+    def unpin(self, path):
+        with self._lock:
+            count = self._pins.get(path, 0) - 1
+            if count > 0:
+                self._pins[path] = count
+            else:
+                self._pins.pop(path, None)
+
+    # 持有文件的锁，避免多个线程同时下载同一文件，写入同一个临时文件
+    @contextlib.contextmanager
+    def locked(self, path):
+        with self._lock:
+            entry = self._path_locks.setdefault(path, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._path_locks[path]
+
+    # 登记新下载或再次使用的文件，超出容量上限时唤醒后台线程清理
+    def add(self, path):
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return
+        with self._lock:
+            entry = self._files.pop(path, None)
+            if entry:
+                self._total_bytes -= entry[0]
+            self._files[path] = [size, time.time()]
+            self._total_bytes += size
+            # 下载完成后临时文件已被重命名
+            entry = self._files.pop(f"{path}.part", None)
+            if entry:
+                self._total_bytes -= entry[0]
+            over_limit = self.max_bytes and self._total_bytes > self.max_bytes
+        if over_limit:
+            self._wakeup.set()
+
+    # 已索引的文件数和总字节数
+    def usage(self):
+        with self._lock:
+            return len(self._files), self._total_bytes
+
+    # 删除过期文件，再按最近使用顺序淘汰文件直至不超过容量上限，返回删除的文件数
+    def sweep(self):
+        now = time.time()
+        victims = []
+        with self._lock:
+            total_bytes = self._total_bytes
+            for path, (size, last_used) in self._files.items():
+                expired = self.max_age_seconds and now - last_used > self.max_age_seconds
+                over_limit = self.max_bytes and total_bytes > self.max_bytes
+                if not expired and not over_limit:
+                    # 索引按last_used排序，后面的文件既未过期，容量也已满足
+                    break
+                if self._is_pinned(path):
+                    continue
+                victims.append(path)
+                total_bytes -= size
+            for path in victims:
+                self._total_bytes -= self._files.pop(path)[0]
+        for path in victims:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                logger.warning(f"[Nicesuno] failed to remove music file, path={path}, error={e}")
+        if victims:
+            logger.info(f"[Nicesuno] storage swept, removed={len(victims)}, bytes={self._total_bytes}")
+        return len(victims)
+
+    # 调用方需持有_lock
+    def _is_pinned(self, path):
+        if path.endswith(".part"):
+            path = path[:-len(".part")]
+        return path in self._pins
+
+    def _run(self):
+        while True:
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.warning(f"[Nicesuno] storage sweep failed, error={e}")
+            self._wakeup.wait(self.sweep_interval)
+            self._wakeup.clear()